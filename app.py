@@ -1,5 +1,6 @@
 import os
 import json
+import hmac
 import logging
 import re
 import random
@@ -7,10 +8,15 @@ import time
 import uuid
 import requests
 from flask import Flask, request, jsonify
-from datetime import datetime
 from twilio.rest import Client
-from queue import Queue
 from threading import Thread
+from response_templates import matches_template, render_template, match_common_response
+from local_answer import confident_answer
+from outbound_scheduler import OutboundScheduler
+from broadcast import BroadcastRunner, SUBSCRIPTION_TOPICS, record_interest, subscribe, unsubscribe
+from knowledge import add_update
+from conversation_log import start_turn, note_turn, note_upstream, finish_turn
+from profiling import profiled, start_trace, finish_trace, list_traces, collapsed_stacks, PROFILE_HEADER
 
 app = Flask(__name__)
 
@@ -23,6 +29,14 @@ ADMIN_PHONES = json.loads(os.getenv("ADMIN_PHONES", "[]"))
 SANDBOX_CODE = os.getenv("SANDBOX_CODE", "default-code")
 WEB_SEARCH_API_KEY = os.getenv("WEB_SEARCH_API_KEY")
 MAPS_LOCATION = os.getenv("MAPS_LOCATION", "https://maps.app.goo.gl/XXXXX")
+# Jawaban lokal dipakai tanpa Groq hanya jika skor >= PREFER, unggul dari
+# kandidat kedua >= MARGIN, dan menyentuh kata kunci passage (lihat local_answer).
+# Ambang MIN yang lebih longgar hanya untuk cadangan saat Groq tidak tersedia.
+LOCAL_PREFER_SCORE = float(os.getenv("LOCAL_PREFER_SCORE", "0.4"))
+LOCAL_PREFER_MARGIN = float(os.getenv("LOCAL_PREFER_MARGIN", "0.1"))
+LOCAL_MIN_SCORE = float(os.getenv("LOCAL_MIN_SCORE", "0.2"))
+# Token untuk endpoint /admin/*; endpoint nonaktif jika kosong
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -37,12 +51,18 @@ except Exception as e:
     twilio_client = None
 
 # ===================== SISTEM ANTRIAN UNTUK PENANGANAN RATE LIMIT =====================
-message_queue = Queue()
 SEND_RETRY_DELAY = 60  # 60 detik antara percobaan pengiriman
+RATE_LIMIT_BACKOFF = 5  # Jeda semua pengiriman setelah 429 agar Twilio tidak dibanjiri
+OUTBOUND_RATE_PER_SEC = float(os.getenv("OUTBOUND_RATE_PER_SEC", "3"))
+
+# Antrian berprioritas: interactive > admin > broadcast (lihat outbound_scheduler)
+message_queue = OutboundScheduler(rate_per_sec=OUTBOUND_RATE_PER_SEC)
 
 def message_sender_worker():
     """Worker untuk mengirim pesan dengan penanganan rate limit"""
     while True:
+        message_data = None
+        done = True  # False hanya jika pesan dijadwalkan ulang (429)
         try:
             message_data = message_queue.get()
             from_number = message_data['to']
@@ -52,7 +72,6 @@ def message_sender_worker():
             
             if attempt > 3:
                 logger.error(f"Gagal mengirim pesan {message_id} setelah 3 percobaan")
-                message_queue.task_done()
                 continue
                 
             try:
@@ -65,20 +84,25 @@ def message_sender_worker():
             except Exception as e:
                 if "429" in str(e):
                     logger.warning(f"Rate limit terdeteksi, mencoba lagi dalam {SEND_RETRY_DELAY} detik")
-                    message_data['attempt'] = attempt + 1
-                    message_queue.put(message_data)
-                    time.sleep(SEND_RETRY_DELAY)
+                    message_queue.requeue_rate_limited(message_data, SEND_RETRY_DELAY, RATE_LIMIT_BACKOFF)
+                    done = False
                 else:
                     logger.error(f"Error mengirim pesan {message_id}: {str(e)}")
-            
-            message_queue.task_done()
         except Exception as e:
             logger.error(f"Worker error: {str(e)}")
+        finally:
+            # Laporkan progres job broadcast (checkpoint) untuk pesan yang sudah tuntas
+            if done and message_data and message_data.get('job_id'):
+                broadcaster.message_done(message_data)
 
 # Mulai worker thread
 sender_thread = Thread(target=message_sender_worker, daemon=True)
 sender_thread.start()
 
+# Runner broadcast: melanjutkan job yang tertunda lalu menunggu job baru
+broadcaster = BroadcastRunner(message_queue)
+broadcaster.start()
+
 # ===================== KONFIGURASI DOMAIN & FUNGSI UTILITAS =====================
 DOMAIN_KEYWORDS = [
     'disnaker', 'tenaga kerja', 'transmigrasi', 'perindustrian',
@@ -94,45 +118,21 @@ conversation_context = {}
 
 def is_greeting(message):
     """Deteksi pesan sapaan atau pembuka percakapan"""
-    greetings = [
-        'halo', 'hai', 'hi', 'pagi', 'siang', 'sore', 'malam',
-        'selamat pagi', 'selamat siang', 'selamat sore', 'selamat malam',
-        'assalamualaikum', 'salam', 'hey', 'helo'
-    ]
-    return any(greeting in message.lower() for greeting in greetings)
+    return matches_template('sapaan', message)
 
 def generate_greeting_response():
     """Buat respons sapaan yang ramah dan natural"""
-    current_hour = datetime.utcnow().hour + 7  # WIB UTC+7
-    time_of_day = "pagi" if 5 <= current_hour < 11 else \
-                 "siang" if 11 <= current_hour < 15 else \
-                 "sore" if 15 <= current_hour < 19 else "malam"
-    
-    greetings = [
-        f"Halo! Selamat {time_of_day} 😊 Ada yang bisa saya bantu seputar DISNAKERTRANSPERIN Bartim?",
-        f"Selamat {time_of_day}! 🙏 Saya siap membantu Anda dengan informasi seputar ketenagakerjaan dan perindustrian Bartim",
-        f"Hai! Selamat {time_of_day} 😊 Ada yang bisa saya bantu hari ini?"
-    ]
-    
-    return random.choice(greetings)
+    return render_template('sapaan')
 
 def is_gratitude(message):
     """Deteksi ucapan terima kasih"""
-    gratitudes = [
-        'terima kasih', 'thanks', 'makasih', 'tengkyu', 'thx',
-        'sangat membantu', 'membantu sekali', 'terimakasih'
-    ]
-    return any(gratitude in message.lower() for gratitude in gratitudes)
+    return matches_template('terima_kasih', message)
 
 def generate_gratitude_response():
     """Buat respons untuk ucapan terima kasih"""
-    responses = [
-        "Sama-sama! 😊 Senang bisa membantu. Jika ada pertanyaan lain, silakan bertanya ya!",
-        "Terima kasih kembali! 🙏 Jangan ragu hubungi kami jika butuh bantuan lebih lanjut",
-        "Dengan senang hati! 😊 Semoga informasinya bermanfaat untuk Anda"
-    ]
-    return random.choice(responses)
+    return render_template('terima_kasih')
 
+@profiled
 def is_conversational(message):
     """Deteksi pesan percakapan umum yang wajar"""
     conversational = [
@@ -141,6 +141,7 @@ def is_conversational(message):
     ]
     return any(term in message.lower() for term in conversational)
 
+@profiled
 def is_question_requires_web_search(question):
     """Deteksi apakah pertanyaan memerlukan pencarian web"""
     web_triggers = [
@@ -151,6 +152,7 @@ def is_question_requires_web_search(question):
     ]
     return any(trigger in question.lower() for trigger in web_triggers)
 
+@profiled
 def perform_web_search(query, official_only=True):
     """Lakukan pencarian web dengan prioritas situs resmi"""
     if not WEB_SEARCH_API_KEY:
@@ -170,7 +172,9 @@ def perform_web_search(query, official_only=True):
         if official_only:
             params['q'] += " site:disnakertransperin.bartimkab.go.id OR site:kemnaker.go.id"
         
+        started = time.perf_counter()
         response = requests.get('https://serpapi.com/search', params=params, timeout=15)
+        note_upstream("serpapi", (time.perf_counter() - started) * 1000)
         results = response.json()
         
         if 'organic_results' in results and results['organic_results']:
@@ -198,6 +202,7 @@ def extract_location_info():
         f"🗺️ *Peta*: {MAPS_LOCATION}"
     )
 
+@profiled
 def handle_industrial_relations(question):
     """Penanganan khusus masalah hubungan industrial"""
     # Cari informasi prosedur mediasi
@@ -224,6 +229,7 @@ def handle_industrial_relations(question):
     
     return response
 
+@profiled
 def is_too_robotic(response):
     """Deteksi apakah respon terlalu kaku/robotik"""
     robotic_indicators = [
@@ -236,6 +242,7 @@ def is_too_robotic(response):
     ]
     return any(indicator in response.lower() for indicator in robotic_indicators)
 
+@profiled
 def rewrite_response_naturally(response, question):
     """Ubah respon kaku menjadi lebih natural"""
     # Tambahkan sapaan jika belum ada
@@ -263,6 +270,7 @@ def rewrite_response_naturally(response, question):
     
     return response
 
+@profiled
 def should_enable_creative_mode(question):
     """Tentukan apakah perlu mengaktifkan mode kreatif"""
     creative_triggers = [
@@ -272,6 +280,7 @@ def should_enable_creative_mode(question):
     ]
     return any(trigger in question.lower() for trigger in creative_triggers)
 
+@profiled
 def is_in_domain(question):
     """Cek apakah pertanyaan relevan dengan domain DISNAKERTRANSPERIN"""
     question_lower = question.lower()
@@ -282,6 +291,7 @@ def is_in_domain(question):
     
     return any(keyword in question_lower for keyword in DOMAIN_KEYWORDS)
 
+@profiled
 def track_conversation_context(from_number, question, response):
     """Simpan konteks percakapan terakhir"""
     if from_number not in conversation_context:
@@ -299,7 +309,62 @@ def track_conversation_context(from_number, question, response):
             break
     
     conversation_context[from_number]['topic'] = main_topic
+    note_turn(topic=main_topic)
+    record_interest(from_number, question)
+
+@profiled
+def handle_subscription_command(user_message, from_number):
+    """Perintah warga: /langganan <topik> dan /berhenti"""
+    command, _, topic = user_message.strip().partition(" ")
+    command = command.lower()
+    
+    if command == "/berhenti":
+        unsubscribe(from_number)
+        return "Anda tidak akan menerima info terbaru lagi. Ketik /langganan <topik> jika ingin berlangganan kembali 🙏"
+    
+    topic_list = "\n".join(f"- {key}: {config['label']}" for key, config in SUBSCRIPTION_TOPICS.items())
+    if not topic.strip() or not subscribe(from_number, topic.strip()):
+        return f"Ketik /langganan <topik>. Topik yang tersedia:\n{topic_list}"
+    return f"✅ Anda berlangganan info {topic.strip()}. Ketik /berhenti untuk berhenti kapan saja 😊"
+
+@profiled
+def handle_admin_command(user_message):
+    """Perintah admin: /update <info>, /broadcast <topik> <pesan>, /broadcast status|lanjut <id>"""
+    if user_message.startswith("/update "):
+        new_info = user_message.replace("/update ", "")
+        if not add_update(new_info):
+            return "❌ Update gagal disimpan, silakan coba lagi"
+        return f"✅ Update berhasil: {new_info}"
+    
+    args = user_message[len("/broadcast"):].strip()
+    if args == "status":
+        jobs = broadcaster.list_jobs()[:3]
+        if not jobs:
+            return "Belum ada broadcast"
+        return "\n".join(
+            f"{job['id']} ({job['topic']}): {job['cursor']}/{job['total']} - {job['status']}"
+            for job in jobs
+        )
+    
+    if args.startswith("lanjut"):
+        job_id = args[len("lanjut"):].strip()
+        try:
+            job = broadcaster.resume_job(job_id)
+        except ValueError as e:
+            return f"❌ {str(e)}"
+        return f"📢 Broadcast {job['id']} dilanjutkan dari {job['cursor']}/{job['total']}"
+    
+    topic, _, body = args.partition(" ")
+    if not body.strip():
+        return f"Format: /broadcast <topik> <pesan>. Topik: {', '.join(SUBSCRIPTION_TOPICS)}"
+    try:
+        job = broadcaster.create_job(topic, body.strip())
+    except ValueError:
+        return f"Topik tidak dikenal. Topik: {', '.join(SUBSCRIPTION_TOPICS)}"
+    add_update(body.strip())
+    return f"📢 Broadcast {job['id']} dijadwalkan ke {job['total']} penerima"
 
+@profiled
 def handle_out_of_domain(question, from_number):
     """Tangani pertanyaan di luar domain dengan lebih elegan"""
     # Cek apakah ini kelanjutan percakapan
@@ -326,93 +391,65 @@ def handle_out_of_domain(question, from_number):
     return random.choice(conversational_responses)
 
 # ===================== FUNGSI UTAMA GENERASI RESPONS =====================
+@profiled
 def generate_ai_response(user_message, from_number):
     """Mengirim permintaan ke Groq API dengan peningkatan baru"""
     user_message_lower = user_message.lower()
     
+    # 0. Perintah admin dan langganan didahulukan agar tidak tertangkap sapaan
+    if from_number in ADMIN_PHONES and user_message.startswith(("/update ", "/broadcast")):
+        note_turn(branch="admin")
+        return handle_admin_command(user_message)
+    
+    if user_message_lower.startswith(("/langganan", "/berhenti")):
+        note_turn(branch="langganan")
+        return handle_subscription_command(user_message, from_number)
+    
     # 1. Tangani sapaan dengan ramah
     if is_greeting(user_message_lower):
+        note_turn(branch="sapaan")
         return generate_greeting_response()
     
     # 2. Tangani ucapan terima kasih
     if is_gratitude(user_message_lower):
+        note_turn(branch="terima_kasih")
         return generate_gratitude_response()
     
-    # 3. Periksa perintah admin khusus
-    if from_number in ADMIN_PHONES and user_message.startswith("/update "):
-        new_info = user_message.replace("/update ", "")
-        return f"✅ Update berhasil: {new_info}"
-    
-    # 4. Tangani permintaan lokasi khusus
+    # 3. Tangani permintaan lokasi khusus
     if "lokasi" in user_message_lower or "alamat" in user_message_lower or "maps" in user_message_lower:
+        note_turn(branch="lokasi")
         return extract_location_info()
     
-    # 5. Tangani permintaan share location
+    # 4. Tangani permintaan share location
     if "sharelock" in user_message_lower or "bagikan lokasi" in user_message_lower:
+        note_turn(branch="sharelock")
         return (
             f"{extract_location_info()}\n\n"
             "Silakan klik link peta di atas untuk petunjuk arah."
         )
     
-    # 6. Tangani masalah hubungan industrial
+    # 5. Tangani masalah hubungan industrial
     industrial_keywords = ['phk', 'pemecatan', 'pesangon', 'hubungan industrial', 'sengketa kerja']
     if any(kw in user_message_lower for kw in industrial_keywords):
+        note_turn(branch="hubungan_industrial")
         return handle_industrial_relations(user_message)
     
-    # 7. Cek relevansi domain - lebih fleksibel untuk percakapan umum
+    # 6. Cek relevansi domain - lebih fleksibel untuk percakapan umum
     if not is_in_domain(user_message) and not is_conversational(user_message_lower):
         response = handle_out_of_domain(user_message, from_number)
+        note_turn(branch="luar_domain")
         track_conversation_context(from_number, user_message, response)
         return response
     
-    # 8. Jawaban untuk pertanyaan umum dengan template lebih baik
-    common_responses = {
-        "halo": "Halo! Ada yang bisa saya bantu seputar DISNAKER Bartim? 😊",
-        "jam buka": "Jam pelayanan: Senin-Kamis 08.00-14.00 WIB | Jumat 08.00-11.00 WIB",
-        "alamat": "Kantor DISNAKER Bartim: Jl. Tjilik Riwut KM 5, Tamiang Layang",
-        "kartu kuning": (
-            "Syarat pembuatan Kartu Kuning (AK1):\n"
-            "1. Fotokopi KTP\n"
-            "2. Pas foto 3x4 (2 lembar)\n"
-            "3. Surat pengantar dari kelurahan\n"
-            "4. Mengisi formulir pendaftaran\n\n"
-            "Kartu Kuning digunakan untuk pencari kerja pertama kali 😊"
-        ),
-        "ak1": (
-            "Kartu AK1 adalah bukti pencatatan bagi pekerja yang pernah bekerja. "
-            "Berbeda dengan Kartu Kuning yang untuk pencari kerja pertama kali.\n\n"
-            "Syarat perpanjangan AK1:\n"
-            "1. Fotokopi AK1 lama\n"
-            "2. Fotokopi KTP\n"
-            "3. Pas foto 4x6 (2 lembar)\n"
-            "4. Surat pengantar dari perusahaan terakhir"
-        ),
-        "perbedaan ak1 dan kartu kuning": (
-            "Perbedaan AK1 dan Kartu Kuning:\n"
-            "1. **Kartu Kuning (AK/I)**: Untuk pencari kerja pertama kali (belum pernah bekerja)\n"
-            "2. **AK1**: Untuk pekerja yang pernah bekerja (memiliki pengalaman kerja)\n\n"
-            "Keduanya adalah dokumen penting dalam dunia ketenagakerjaan, "
-            "tapi digunakan pada fase berbeda dalam karir seseorang 😊"
-        ),
-        "pelatihan": (
-            "Program pelatihan gratis DISNAKER Bartim:\n"
-            "- Teknisi HP\n"
-            "- Menjahit\n"
-            "- Las\n"
-            "- Tata Rias\n"
-            "- Komputer Dasar\n\n"
-            "Pendaftaran: Setiap bulan pertama di Kantor DISNAKER atau online melalui disnakertransperin.bartimkab.go.id"
-        )
-    }
-    
-    # Cek pertanyaan umum dengan pencocokan lebih akurat
-    for keyword, response in common_responses.items():
-        # Gunakan regex untuk pencocokan lebih tepat
-        if re.search(r'\b' + re.escape(keyword) + r'\b', user_message_lower):
-            track_conversation_context(from_number, user_message, response)
-            return response
+    # 7. Jawaban untuk pertanyaan umum dari template knowledge base
+    response = match_common_response(user_message_lower)
+    note_turn(template_hit=bool(response))
+    if response:
+        note_turn(branch="template")
+        track_conversation_context(from_number, user_message, response)
+        return response
     
-    # 9. Cek apakah perlu pencarian web untuk info terkini
+    # 8. Cek apakah perlu pencarian web untuk info terkini
     if is_question_requires_web_search(user_message):
         web_result = perform_web_search(user_message)
         if web_result:
@@ -423,16 +460,28 @@ def generate_ai_response(user_message, from_number):
                 f"📚 Sumber: {web_result.get('link', '')}\n\n"
                 "Info dapat berubah, silakan konfirmasi ke 0538-1234567 untuk verifikasi."
             )
+            note_turn(branch="web_search")
             track_conversation_context(from_number, user_message, response)
             return response
     
+    # 9. Jawab dari indeks lokal jika cukup yakin, tanpa memanggil Groq
+    if not should_enable_creative_mode(user_message):
+        local_response, local_score = confident_answer(user_message, LOCAL_PREFER_SCORE, LOCAL_PREFER_MARGIN)
+        note_turn(local_score=round(local_score, 3))
+        if local_response:
+            note_turn(branch="lokal")
+            track_conversation_context(from_number, user_message, local_response)
+            return local_response
+    
     # 10. Gunakan Groq AI dengan prompt yang ditingkatkan
+    note_turn(branch="groq")
     ai_response = query_groq(user_message)
     
     # 11. Aktifkan mode kreatif jika diperlukan
     if should_enable_creative_mode(user_message):
         creative_response = generate_creative_response(user_message)
         if creative_response:
+            note_turn(branch="kreatif")
             ai_response = creative_response
     
     # 12. Periksa dan perbaiki respon yang terlalu kaku
@@ -442,10 +491,11 @@ def generate_ai_response(user_message, from_number):
     track_conversation_context(from_number, user_message, ai_response)
     return ai_response
 
+@profiled
 def query_groq(user_message):
     """Mengirim permintaan ke Groq API dengan prompt yang lebih ketat"""
     if not GROQ_API_KEY:
-        return "Maaf, layanan AI sedang dalam pemeliharaan"
+        return answer_from_knowledge(user_message)
     
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
@@ -481,6 +531,7 @@ def query_groq(user_message):
         "stream": False
     }
     
+    started = time.perf_counter()
     try:
         response = requests.post(
             "https://api.groq.com/openai/v1/chat/completions",
@@ -491,15 +542,20 @@ def query_groq(user_message):
         
         if response.status_code == 200:
             data = response.json()
+            note_upstream("groq", (time.perf_counter() - started) * 1000,
+                          groq_tokens=data.get('usage', {}).get('total_tokens', 0))
             return data['choices'][0]['message']['content']
         else:
+            note_upstream("groq", (time.perf_counter() - started) * 1000, groq_error=response.status_code)
             logger.error(f"Groq API error: {response.status_code} - {response.text}")
             return answer_from_knowledge(user_message)
             
     except Exception as e:
+        note_upstream("groq", (time.perf_counter() - started) * 1000, groq_error="exception")
         logger.error(f"Groq API exception: {str(e)}")
-        return "Maaf, layanan AI sedang sibuk. Silakan coba lagi nanti."
+        return answer_from_knowledge(user_message)
 
+@profiled
 def generate_creative_response(user_message):
     """Buat respon kreatif untuk pertanyaan yang membutuhkan pemikiran lateral"""
     try:
@@ -528,6 +584,7 @@ def generate_creative_response(user_message):
             "stream": False
         }
         
+        started = time.perf_counter()
         response = requests.post(
             "https://api.groq.com/openai/v1/chat/completions",
             json=payload,
@@ -537,6 +594,8 @@ def generate_creative_response(user_message):
         
         if response.status_code == 200:
             data = response.json()
+            note_upstream("groq", (time.perf_counter() - started) * 1000,
+                          groq_tokens=data.get('usage', {}).get('total_tokens', 0))
             return data['choices'][0]['message']['content']
             
     except Exception as e:
@@ -544,8 +603,16 @@ def generate_creative_response(user_message):
         
     return None
 
+@profiled
 def answer_from_knowledge(user_message):
     """Fallback ke knowledge base jika Groq error"""
+    # Ambang skor lebih longgar dari jalur utama, tapi kata kunci tetap harus cocok
+    local_response, local_score = confident_answer(user_message, LOCAL_MIN_SCORE, 0.0)
+    note_turn(fallback="knowledge", local_score=round(local_score, 3))
+    if local_response:
+        note_turn(fallback="lokal")
+        return local_response
+    
     low_msg = user_message.lower()
     
     if "lowongan" in low_msg or "pekerjaan" in low_msg:
@@ -575,13 +642,35 @@ def home():
             "Domain-focused responses",
             "Location sharing",
             "Industrial relations support"
-        ]
+        ],
+        "outbound_queue": message_queue.stats()
     })
 
 @app.route('/test')
 def test_endpoint():
     return "Test endpoint working! Chatbot is operational.", 200
 
+def is_admin_request():
+    """Cek token admin pada header X-Admin-Token"""
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_API_TOKEN) and hmac.compare_digest(token, ADMIN_API_TOKEN)
+
+@app.route('/admin/profile/traces')
+def profile_traces():
+    """Daftar trace profiling di ring buffer"""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(list_traces())
+
+@app.route('/admin/profile/stacks')
+def profile_stacks():
+    """Dump collapsed stack (flamegraph.pl / speedscope); ?metric=wall|cpu&trace=<id>"""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    metric = request.args.get('metric', 'wall')
+    stacks = collapsed_stacks(metric=metric, trace_id=request.args.get('trace'))
+    return stacks, 200, {"Content-Type": "text/plain; charset=utf-8"}
+
 @app.route('/webhook', methods=['GET', 'POST'])
 def webhook():
     """Endpoint utama untuk WhatsApp webhook"""
@@ -606,10 +695,20 @@ def webhook():
         if not incoming_msg:
             return '', 200
         
-        logger.info(f"Pesan masuk dari {from_number}: {incoming_msg}")
+        logger.debug("Pesan masuk dari %s: %s", from_number, incoming_msg)
         
         # Process message
-        bot_response = generate_ai_response(incoming_msg, from_number)
+        start_turn(from_number, incoming_msg)
+        # Header profiling hanya dihormati bersama token admin yang valid
+        force_trace = request.headers.get(PROFILE_HEADER) == "1" and is_admin_request()
+        trace_id = start_trace("webhook", force=force_trace)
+        try:
+            bot_response = generate_ai_response(incoming_msg, from_number)
+        except Exception:
+            finish_trace()
+            finish_turn(error=True, trace_id=trace_id)
+            raise
+        finish_trace()
         
         # Masukkan ke antrian pengiriman
         message_data = {
@@ -618,7 +717,8 @@ def webhook():
             'body': bot_response,
             'attempt': 0
         }
-        message_queue.put(message_data)
+        message_queue.put(message_data, lane='admin' if from_number in ADMIN_PHONES else 'interactive')
+        finish_turn(message_id=message_data['id'], response_chars=len(bot_response), trace_id=trace_id)
         logger.info(f"Pesan dimasukkan ke antrian: {message_data['id']}")
         
         return '', 200
@@ -0,0 +1,399 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from itertools import islice
+from threading import Thread, Lock, Event, Condition
+
+logger = logging.getLogger(__name__)
+
+# ===================== KONFIGURASI =====================
+SUBSCRIPTION_FILE = "disnaker_subscriptions.json"
+BROADCAST_DIR = "broadcast_jobs"
+BROADCAST_CHUNK_SIZE = 100  # Penerima per checkpoint
+BROADCAST_LANE_LIMIT = 200  # Maksimal pesan broadcast yang belum selesai dikirim
+SUBSCRIPTION_SAVE_INTERVAL = 30  # Detik antar penyimpanan minat implisit
+
+# Topik langganan dan kata kunci percakapan yang dipetakan ke topik tersebut
+SUBSCRIPTION_TOPICS = {
+    "kartu_kuning": {"label": "Kartu Kuning (AK-1)", "keywords": ["kartu kuning", "ak1", "pencari kerja"]},
+    "pelatihan": {"label": "Pelatihan Kerja", "keywords": ["pelatihan"]},
+    "lowongan": {"label": "Lowongan Kerja", "keywords": ["lowongan", "cari kerja", "bursa kerja"]},
+    "transmigrasi": {"label": "Transmigrasi", "keywords": ["transmigrasi", "transmigran"]},
+}
+
+# Pola kata utuh agar "pencari kerja" tidak ikut cocok dengan "cari kerja"
+_TOPIC_PATTERNS = {
+    topic: re.compile(r'\b(?:' + "|".join(re.escape(k) for k in config['keywords']) + r')\b')
+    for topic, config in SUBSCRIPTION_TOPICS.items()
+}
+
+# ===================== INDEKS LANGGANAN =====================
+# {"topics": {topik: {nomor: "opt_in" | "minat"}}, "opt_out": [nomor]}
+_subscriptions = None
+_subscriptions_dirty = False
+_subscriptions_saved_at = 0.0
+_subscriptions_lock = Lock()
+
+def topic_for_keyword(keyword):
+    """Petakan kata kunci percakapan ke topik langganan, None jika tidak ada"""
+    # "_" dan spasi disamakan: "cari kerja", "cari_kerja", "kartu kuning" semuanya valid
+    keyword = " ".join((keyword or "").lower().replace("_", " ").split())
+    for topic, config in SUBSCRIPTION_TOPICS.items():
+        if keyword == topic.replace("_", " ") or keyword in config['keywords']:
+            return topic
+    return None
+
+def _load_subscriptions():
+    global _subscriptions
+    if _subscriptions is None:
+        try:
+            with open(SUBSCRIPTION_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except Exception as e:
+            logger.error(f"Error loading subscriptions: {str(e)}")
+            data = {}
+        _subscriptions = {
+            "topics": {topic: dict(data.get('topics', {}).get(topic, {})) for topic in SUBSCRIPTION_TOPICS},
+            "opt_out": set(data.get('opt_out', []))
+        }
+    return _subscriptions
+
+def _save_subscriptions(force=False):
+    """Simpan indeks langganan (dipanggil dengan _subscriptions_lock dipegang)"""
+    global _subscriptions_dirty, _subscriptions_saved_at
+    if not _subscriptions_dirty:
+        return
+    if not force and time.monotonic() - _subscriptions_saved_at < SUBSCRIPTION_SAVE_INTERVAL:
+        return
+
+    data = {
+        "topics": _subscriptions['topics'],
+        "opt_out": sorted(_subscriptions['opt_out'])
+    }
+    try:
+        tmp_path = f"{SUBSCRIPTION_FILE}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, SUBSCRIPTION_FILE)
+        _subscriptions_dirty = False
+        _subscriptions_saved_at = time.monotonic()
+    except Exception as e:
+        logger.error(f"Error saving subscriptions: {str(e)}")
+
+def flush_subscriptions():
+    """Paksa simpan minat implisit yang belum tertulis"""
+    with _subscriptions_lock:
+        if _subscriptions is not None:
+            _save_subscriptions(force=True)
+
+atexit.register(flush_subscriptions)
+
+def topics_in_message(message):
+    """Semua topik langganan yang kata kuncinya muncul di pesan"""
+    message = (message or "").lower()
+    return [topic for topic, pattern in _TOPIC_PATTERNS.items() if pattern.search(message)]
+
+def record_interest(phone, message):
+    """Catat minat implisit dari isi pesan warga"""
+    global _subscriptions_dirty
+    topics = topics_in_message(message)
+    if not topics:
+        return
+    with _subscriptions_lock:
+        subs = _load_subscriptions()
+        if phone in subs['opt_out']:
+            return
+        for topic in topics:
+            if phone not in subs['topics'][topic]:
+                subs['topics'][topic][phone] = "minat"
+                _subscriptions_dirty = True
+        _save_subscriptions()
+
+def subscribe(phone, topic):
+    """Daftarkan langganan eksplisit; kembalikan False jika topik tidak dikenal"""
+    global _subscriptions_dirty
+    topic = topic_for_keyword(topic)
+    if not topic:
+        return False
+    with _subscriptions_lock:
+        subs = _load_subscriptions()
+        subs['opt_out'].discard(phone)
+        subs['topics'][topic][phone] = "opt_in"
+        _subscriptions_dirty = True
+        _save_subscriptions(force=True)
+    return True
+
+def unsubscribe(phone):
+    """Berhenti dari semua langganan dan cegah minat implisit dicatat lagi"""
+    global _subscriptions_dirty
+    with _subscriptions_lock:
+        subs = _load_subscriptions()
+        for members in subs['topics'].values():
+            members.pop(phone, None)
+        subs['opt_out'].add(phone)
+        _subscriptions_dirty = True
+        _save_subscriptions(force=True)
+
+def get_recipients(topic, include_interest=True):
+    """Daftar nomor penerima broadcast untuk topik, terurut agar bisa dilanjutkan"""
+    with _subscriptions_lock:
+        subs = _load_subscriptions()
+        members = subs['topics'].get(topic, {})
+        return sorted(
+            phone for phone, source in members.items()
+            if phone not in subs['opt_out'] and (include_interest or source == "opt_in")
+        )
+
+def without_opted_out(phones):
+    """Buang nomor yang sudah /berhenti, dicek ulang saat broadcast berjalan"""
+    with _subscriptions_lock:
+        opt_out = _load_subscriptions()['opt_out']
+        return [phone for phone in phones if phone not in opt_out]
+
+# ===================== JOB BROADCAST =====================
+def format_broadcast_message(topic, body):
+    label = SUBSCRIPTION_TOPICS[topic]['label']
+    return (
+        f"📢 Info terbaru DISNAKERTRANSPERIN Bartim - {label}:\n"
+        f"{body}\n\n"
+        "Balas /berhenti untuk berhenti menerima info."
+    )
+
+def _job_path(job_id, suffix="json"):
+    return os.path.join(BROADCAST_DIR, f"{job_id}.{suffix}")
+
+def _save_job(job):
+    tmp_path = _job_path(job['id'], "json.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(job, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, _job_path(job['id']))
+
+def _load_job(job_id):
+    with open(_job_path(job_id), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _try_lock_job(job_id):
+    """Kunci file job agar hanya satu proses (worker gunicorn) yang menjalankannya"""
+    lock_file = open(_job_path(job_id, "lock"), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def _unlock_job(lock_file):
+    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    lock_file.close()
+
+class BroadcastRunner:
+    """Menjalankan job broadcast satu per satu lewat jalur 'broadcast' antrian keluar.
+
+    Penerima dibekukan ke file saat job dibuat lalu dibaca per chunk. Worker
+    pengirim memanggil message_done untuk setiap pesan yang selesai; posisi
+    (cursor) disimpan setelah semua pesan satu chunk selesai, sehingga setelah
+    crash job dilanjutkan dari checkpoint terakhir, bukan dari awal.
+    """
+
+    def __init__(self, message_queue):
+        self._queue = message_queue
+        self._wakeup = Event()
+        self._thread = None
+        self._lock = Lock()
+        # Chunk job yang sedang dikirim: {cursor akhir chunk: jumlah pesan belum selesai}
+        self._run_id = None  # Berganti setiap _run_job, termasuk saat job dilanjutkan
+        self._inflight = {}
+        self._progress = Condition()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(BROADCAST_DIR, exist_ok=True)
+                self._thread = Thread(target=self._worker, daemon=True)
+                self._thread.start()
+
+    def create_job(self, topic, body, include_interest=True):
+        """Buat job broadcast baru, kembalikan data job"""
+        topic = topic_for_keyword(topic)
+        if not topic:
+            raise ValueError("Topik broadcast tidak dikenal")
+
+        os.makedirs(BROADCAST_DIR, exist_ok=True)
+        job_id = datetime.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        recipients = get_recipients(topic, include_interest)
+        with open(_job_path(job_id, "recipients"), 'w', encoding='utf-8') as f:
+            f.writelines(f"{phone}\n" for phone in recipients)
+
+        job = {
+            "id": job_id,
+            "topic": topic,
+            "body": format_broadcast_message(topic, body),
+            "created": datetime.now().isoformat(),
+            "total": len(recipients),
+            "cursor": 0,
+            "status": "pending"
+        }
+        _save_job(job)
+        logger.info(f"Job broadcast {job_id} dibuat untuk {job['total']} penerima")
+
+        self.start()
+        self._wakeup.set()
+        return job
+
+    def list_jobs(self):
+        """Semua job broadcast, terbaru lebih dulu"""
+        if not os.path.isdir(BROADCAST_DIR):
+            return []
+        jobs = []
+        for name in sorted(os.listdir(BROADCAST_DIR), reverse=True):
+            if name.endswith(".json"):
+                try:
+                    jobs.append(_load_job(name[:-len(".json")]))
+                except Exception as e:
+                    logger.error(f"Error loading broadcast job {name}: {str(e)}")
+        return jobs
+
+    def resume_job(self, job_id):
+        """Jalankan ulang job gagal/terhenti dari checkpoint terakhir"""
+        try:
+            job = _load_job(job_id)
+        except FileNotFoundError:
+            raise ValueError("Job broadcast tidak ditemukan")
+        if job['status'] == "done":
+            raise ValueError("Job broadcast sudah selesai")
+        job['status'] = "pending"
+        job.pop('error', None)
+        _save_job(job)
+
+        self.start()
+        self._wakeup.set()
+        return job
+
+    def message_done(self, message_data):
+        """Dipanggil worker pengirim saat pesan broadcast terkirim atau gagal permanen"""
+        chunk_end = message_data.get('chunk_end')
+        if chunk_end is None:
+            return
+        with self._progress:
+            # Pesan sisa job lain atau run sebelumnya (mis. job gagal lalu
+            # dilanjutkan) tidak boleh memajukan cursor run ini
+            if message_data.get('run_id') != self._run_id:
+                return
+            if chunk_end in self._inflight:
+                self._inflight[chunk_end] -= 1
+                self._progress.notify_all()
+
+    def _next_job(self):
+        """Ambil job tertunda tertua yang belum dikunci proses lain"""
+        for job in reversed(self.list_jobs()):
+            if job['status'] not in ("pending", "running"):
+                continue
+            lock_file = _try_lock_job(job['id'])
+            if lock_file is None:
+                continue
+            # Baca ulang setelah dapat kunci: proses lain mungkin baru menyelesaikannya
+            job = _load_job(job['id'])
+            if job['status'] in ("pending", "running"):
+                return job, lock_file
+            _unlock_job(lock_file)
+        return None, None
+
+    def _checkpoint(self, job):
+        """Majukan cursor melewati chunk terdepan yang sudah selesai semua"""
+        advanced = False
+        while self._inflight:
+            chunk_end = next(iter(self._inflight))
+            if self._inflight[chunk_end] > 0:
+                break
+            del self._inflight[chunk_end]
+            job['cursor'] = chunk_end
+            advanced = True
+        if advanced:
+            _save_job(job)
+            logger.info(f"Broadcast {job['id']}: {job['cursor']}/{job['total']}")
+
+    def _wait_until(self, job, condition):
+        """Tunggu kabar dari worker pengirim sambil menyimpan checkpoint"""
+        with self._progress:
+            while True:
+                self._checkpoint(job)
+                if condition():
+                    return
+                self._progress.wait(timeout=5)
+
+    def _run_job(self, job):
+        job['status'] = "running"
+        _save_job(job)
+        with self._progress:
+            self._run_id = uuid.uuid4().hex
+            self._inflight = {}
+
+        with open(_job_path(job['id'], "recipients"), 'r', encoding='utf-8') as f:
+            recipients = (line.strip() for line in islice(f, job['cursor'], None))
+            chunk_end = job['cursor']
+            while True:
+                chunk = [phone for phone in islice(recipients, BROADCAST_CHUNK_SIZE) if phone]
+                if not chunk:
+                    break
+
+                # Warga yang /berhenti setelah job dibuat tidak dikirimi lagi
+                to_send = without_opted_out(chunk)
+
+                # Batasi jumlah pesan broadcast yang belum selesai di antrian
+                self._wait_until(
+                    job, lambda: sum(self._inflight.values()) + len(to_send) <= BROADCAST_LANE_LIMIT
+                )
+                chunk_end += len(chunk)
+                with self._progress:
+                    self._inflight[chunk_end] = len(to_send)
+                for phone in to_send:
+                    self._queue.put({
+                        'id': str(uuid.uuid4()),
+                        'to': phone,
+                        'body': job['body'],
+                        'attempt': 0,
+                        'job_id': job['id'],
+                        'run_id': self._run_id,
+                        'chunk_end': chunk_end
+                    }, lane='broadcast')
+
+        self._wait_until(job, lambda: not self._inflight)
+        job['status'] = "done"
+        job['finished'] = datetime.now().isoformat()
+        _save_job(job)
+        logger.info(f"Broadcast {job['id']} selesai")
+
+    def _worker(self):
+        """Worker yang melanjutkan job tertunda dan menjalankan job baru"""
+        while True:
+            job = lock_file = None
+            try:
+                job, lock_file = self._next_job()
+                if job is None:
+                    self._wakeup.wait(timeout=60)
+                    self._wakeup.clear()
+                    continue
+                self._run_job(job)
+            except Exception as e:
+                logger.error(f"Broadcast worker error: {str(e)}")
+                if job is not None:
+                    # Job tetap di checkpoint terakhir; admin bisa melanjutkan
+                    # dengan /broadcast lanjut <id>
+                    job['status'] = "failed"
+                    job['error'] = str(e)
+                    try:
+                        _save_job(job)
+                    except Exception as save_error:
+                        logger.error(f"Gagal menyimpan status job {job['id']}: {str(save_error)}")
+                time.sleep(5)
+            finally:
+                if lock_file is not None:
+                    _unlock_job(lock_file)
@@ -0,0 +1,289 @@
+import argparse
+import atexit
+import contextvars
+import fcntl
+import glob
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from queue import Queue, Empty, Full
+from threading import Thread, Lock
+
+logger = logging.getLogger(__name__)
+
+# ===================== KONFIGURASI =====================
+LOG_DIR = os.getenv("CONVERSATION_LOG_DIR", "logs")
+LOG_BATCH_SIZE = 200  # Maksimal event per sekali tulis
+LOG_FLUSH_INTERVAL = 2  # Detik menunggu sebelum batch kecil tetap ditulis
+LOG_MAX_FILE_BYTES = int(os.getenv("CONVERSATION_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_RETENTION_DAYS = int(os.getenv("CONVERSATION_LOG_RETENTION_DAYS", "400"))
+LOG_QUEUE_SIZE = 10000
+
+# Kunci HMAC untuk menyamarkan nomor telepon. Jika kosong dipakai kunci acak per
+# proses: nomor tetap tidak bisa ditebak, tapi analitik per pengguna hanya
+# konsisten selama proses hidup.
+LOG_HASH_KEY = (os.getenv("CONVERSATION_LOG_HASH_KEY") or os.urandom(32).hex()).encode('utf-8')
+
+# Teks pesan warga hanya disimpan jika diaktifkan eksplisit, dan ikut terhapus
+# bersama file lognya setelah CONVERSATION_LOG_RETENTION_DAYS. Default: hanya panjang pesan.
+LOG_MESSAGE_TEXT = os.getenv("CONVERSATION_LOG_MESSAGE_TEXT", "0") == "1"
+
+# Field yang dijumlahkan jika dicatat berkali-kali dalam satu giliran
+COUNTER_FIELDS = {"groq_tokens"}
+
+FILE_PATTERN = re.compile(r"percakapan-(\d{4}-\d{2}-\d{2})(?:\.(\d+))?\.jsonl\.gz$")
+
+_event_queue = Queue(maxsize=LOG_QUEUE_SIZE)
+_writer_thread = None
+_writer_lock = Lock()
+_file_lock = Lock()  # Antar thread; antar proses memakai flock di _append_day
+_dropped_events = 0
+
+# Event giliran (turn) yang sedang diproses di thread/konteks ini
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+
+# ===================== PENCATATAN GILIRAN PERCAKAPAN =====================
+def hash_number(phone):
+    """Samarkan nomor telepon (HMAC) agar log tidak menyimpan nomor asli"""
+    return hmac.new(LOG_HASH_KEY, phone.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+def start_turn(from_number, message):
+    """Mulai mencatat satu giliran percakapan"""
+    turn = {
+        "ts": datetime.now().isoformat(timespec='milliseconds'),
+        "user": hash_number(from_number),
+        "pesan": message if LOG_MESSAGE_TEXT else None,
+        "pesan_chars": len(message),
+        "branch": None,
+        "topic": None,
+        "upstream": [],
+        "upstream_ms": {},
+        "_start": time.perf_counter()
+    }
+    _current_turn.set(turn)
+    return turn
+
+def note_turn(**fields):
+    """Tambahkan informasi ke giliran yang sedang berjalan (no-op jika tidak ada)"""
+    turn = _current_turn.get()
+    if turn is not None:
+        turn.update(fields)
+
+def note_upstream(name, elapsed_ms, **fields):
+    """Catat pemanggilan layanan luar (Groq, pencarian web) beserta latensinya"""
+    turn = _current_turn.get()
+    if turn is None:
+        return
+    turn['upstream'].append(name)
+    turn['upstream_ms'][name] = round(turn['upstream_ms'].get(name, 0) + elapsed_ms, 1)
+    for key, value in fields.items():
+        if key in COUNTER_FIELDS:
+            turn[key] = turn.get(key, 0) + value
+        else:
+            turn[key] = value
+
+def finish_turn(**fields):
+    """Tutup giliran aktif dan kirim ke penulis log di background"""
+    turn = _current_turn.get()
+    if turn is None:
+        return
+    _current_turn.set(None)
+    turn.update(fields)
+    turn['latency_ms'] = round((time.perf_counter() - turn.pop('_start')) * 1000, 1)
+    log_event(turn)
+
+def log_event(event):
+    """Masukkan event ke antrian tanpa memblokir; event dibuang jika antrian penuh"""
+    global _dropped_events
+    _ensure_writer()
+    try:
+        _event_queue.put_nowait(event)
+    except Full:
+        _dropped_events += 1
+
+# ===================== PENULIS BACKGROUND =====================
+def _ensure_writer():
+    global _writer_thread
+    if _writer_thread is not None:
+        return
+    with _writer_lock:
+        if _writer_thread is None:
+            _writer_thread = Thread(target=_writer_worker, daemon=True)
+            _writer_thread.start()
+
+def _log_path(day, part):
+    suffix = f".{part}" if part else ""
+    return os.path.join(LOG_DIR, f"percakapan-{day}{suffix}.jsonl.gz")
+
+def _current_part(day):
+    """Cari bagian file terakhir untuk hari tertentu"""
+    parts = [0]
+    for path in glob.glob(os.path.join(LOG_DIR, f"percakapan-{day}*.jsonl.gz")):
+        match = FILE_PATTERN.search(os.path.basename(path))
+        if match and match.group(1) == day:
+            parts.append(int(match.group(2) or 0))
+    return max(parts)
+
+def _write_batch(batch, parts):
+    """Tulis batch event ke file harian (gzip, mode append)"""
+    by_day = defaultdict(list)
+    for event in batch:
+        by_day[event.get('ts', '')[:10] or datetime.now().strftime("%Y-%m-%d")].append(event)
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    with _file_lock:
+        for day, events in by_day.items():
+            _append_day(day, events, parts)
+
+def _append_day(day, events, parts):
+    if day not in parts:
+        parts[day] = _current_part(day)
+    path = _log_path(day, parts[day])
+    if os.path.exists(path) and os.path.getsize(path) >= LOG_MAX_FILE_BYTES:
+        parts[day] += 1
+        path = _log_path(day, parts[day])
+
+    lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events)
+    # Setiap append menjadi satu member gzip; gzip.open membaca semuanya berurutan.
+    # flock mencegah member dari worker gunicorn lain tertulis bersilangan.
+    member = gzip.compress(lines.encode('utf-8'))
+    with open(path, 'ab') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(member)
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _remove_expired_logs():
+    """Hapus file log yang melewati masa simpan"""
+    cutoff = (datetime.now() - timedelta(days=LOG_RETENTION_DAYS)).strftime("%Y-%m-%d")
+    for path in glob.glob(os.path.join(LOG_DIR, "percakapan-*.jsonl.gz")):
+        match = FILE_PATTERN.search(os.path.basename(path))
+        if match and match.group(1) < cutoff:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.error(f"Gagal menghapus log lama {path}: {str(e)}")
+
+def _drain(limit):
+    batch = []
+    while len(batch) < limit:
+        try:
+            batch.append(_event_queue.get_nowait())
+        except Empty:
+            break
+    return batch
+
+def _writer_worker():
+    """Worker yang mengumpulkan event dan menulisnya per batch"""
+    parts = {}
+    last_cleanup_day = None
+    while True:
+        try:
+            first = _event_queue.get(timeout=LOG_FLUSH_INTERVAL)
+        except Empty:
+            continue
+
+        time.sleep(0.05)  # Beri kesempatan event lain ikut dalam batch yang sama
+        batch = [first] + _drain(LOG_BATCH_SIZE - 1)
+        try:
+            _write_batch(batch, parts)
+        except Exception as e:
+            logger.error(f"Conversation log write error: {str(e)}")
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        if today != last_cleanup_day:
+            last_cleanup_day = today
+            _remove_expired_logs()
+
+def flush():
+    """Tulis semua event yang masih di antrian (dipanggil saat proses berhenti)"""
+    parts = {}
+    while True:
+        batch = _drain(LOG_BATCH_SIZE)
+        if not batch:
+            break
+        try:
+            _write_batch(batch, parts)
+        except Exception as e:
+            logger.error(f"Conversation log flush error: {str(e)}")
+            break
+    if _dropped_events:
+        logger.warning(f"{_dropped_events} event log percakapan dibuang karena antrian penuh")
+
+atexit.register(flush)
+
+# ===================== ANALITIK OFFLINE =====================
+def iter_events(days=30, until=None):
+    """Baca event dari file log dalam rentang hari tertentu"""
+    until = until or datetime.now()
+    start_day = (until - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    end_day = until.strftime("%Y-%m-%d")
+
+    files = []
+    for path in glob.glob(os.path.join(LOG_DIR, "percakapan-*.jsonl.gz")):
+        match = FILE_PATTERN.search(os.path.basename(path))
+        if match and start_day <= match.group(1) <= end_day:
+            files.append((match.group(1), int(match.group(2) or 0), path))
+
+    for _, _, path in sorted(files):
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except (OSError, EOFError) as e:
+            # File yang terpotong (mis. proses mati saat menulis) tetap dibaca sebisanya
+            logger.warning(f"Log {path} tidak lengkap: {str(e)}")
+
+def top_intents(days=30, limit=10):
+    """Topik/branch yang paling sering ditanyakan"""
+    counter = Counter(e.get('topic') or e.get('branch') or 'unknown' for e in iter_events(days))
+    return counter.most_common(limit)
+
+def template_miss_rate(days=30):
+    """Persentase pesan yang dicek ke template tapi tidak ada yang cocok"""
+    checked = missed = 0
+    for event in iter_events(days):
+        if 'template_hit' in event:
+            checked += 1
+            missed += not event['template_hit']
+    return {"checked": checked, "missed": missed, "miss_rate": missed / checked if checked else 0.0}
+
+def groq_usage_per_day(days=30):
+    """Jumlah panggilan dan token Groq per hari"""
+    usage = defaultdict(lambda: {"calls": 0, "tokens": 0})
+    for event in iter_events(days):
+        calls = event.get('upstream', []).count('groq')
+        if calls:
+            day = usage[event['ts'][:10]]
+            day['calls'] += calls
+            day['tokens'] += event.get('groq_tokens', 0)
+    return dict(sorted(usage.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Analitik log percakapan chatbot")
+    parser.add_argument("query", choices=["top-intents", "template-miss", "groq-usage"])
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    if args.query == "top-intents":
+        result = top_intents(args.days)
+    elif args.query == "template-miss":
+        result = template_miss_rate(args.days)
+    else:
+        result = groq_usage_per_day(args.days)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,22 @@
 import json
 import os
+import time
 from datetime import datetime
 
+from profiling import profiled
+
 # Konfigurasi file pengetahuan
 KNOWLEDGE_FILE = "disnaker_knowledge.json"
+
+# Revisi knowledge di proses ini, naik setiap kali save_knowledge berhasil.
+# Digabung dengan mtime file (lihat get_knowledge_revision) agar perubahan
+# dari worker lain atau edit manual juga terdeteksi.
+_knowledge_revision = 0
+
+# stat() file knowledge di-cache agar jalur template tidak menyentuh disk di setiap pesan
+REVISION_CHECK_INTERVAL = 1.0  # Detik antar pengecekan mtime file
+_file_stamp = (None, None)
+_file_checked_at = None
 DEFAULT_KNOWLEDGE = {
     "meta": {
         "last_updated": datetime.now().isoformat(),
@@ -57,9 +70,91 @@ DEFAULT_KNOWLEDGE = {
             "pertanyaan": "Bagaimana cara mengetahui lowongan kerja terbaru?",
             "jawaban": "Info lowongan kerja terbaru dapat diakses di website dinas"
         }
-    ]
+    ],
+    # Template jawaban cepat. Placeholder {..} diisi dari data knowledge di atas
+    # (lihat response_templates.build_template_context).
+    "template_respons": {
+        "sapaan": {
+            "pemicu": [
+                "halo", "hai", "hi", "pagi", "siang", "sore", "malam",
+                "selamat pagi", "selamat siang", "selamat sore", "selamat malam",
+                "assalamualaikum", "salam", "hey", "helo"
+            ],
+            "jawaban": [
+                "Halo! Selamat {waktu} 😊 Ada yang bisa saya bantu seputar DISNAKERTRANSPERIN Bartim?",
+                "Selamat {waktu}! 🙏 Saya siap membantu Anda dengan informasi seputar ketenagakerjaan dan perindustrian Bartim",
+                "Hai! Selamat {waktu} 😊 Ada yang bisa saya bantu hari ini?"
+            ]
+        },
+        "terima_kasih": {
+            "pemicu": [
+                "terima kasih", "thanks", "makasih", "tengkyu", "thx",
+                "sangat membantu", "membantu sekali", "terimakasih"
+            ],
+            "jawaban": [
+                "Sama-sama! 😊 Senang bisa membantu. Jika ada pertanyaan lain, silakan bertanya ya!",
+                "Terima kasih kembali! 🙏 Jangan ragu hubungi kami jika butuh bantuan lebih lanjut",
+                "Dengan senang hati! 😊 Semoga informasinya bermanfaat untuk Anda"
+            ]
+        },
+        "umum": [
+            {
+                "kata_kunci": "halo",
+                "jawaban": "Halo! Ada yang bisa saya bantu seputar DISNAKER Bartim? 😊"
+            },
+            {
+                "kata_kunci": "jam buka",
+                "jawaban": "Jam pelayanan: {jam_operasional}"
+            },
+            {
+                "kata_kunci": "alamat",
+                "jawaban": "Kantor DISNAKER Bartim: {alamat}"
+            },
+            {
+                "kata_kunci": "kartu kuning",
+                "jawaban": (
+                    "Syarat pembuatan {nama_kartu_kuning}:\n"
+                    "{syarat_kartu_kuning}\n\n"
+                    "Biaya: {biaya_kartu_kuning}. "
+                    "Kartu Kuning digunakan untuk pencari kerja pertama kali 😊"
+                )
+            },
+            {
+                "kata_kunci": "ak1",
+                "jawaban": (
+                    "Kartu AK1 adalah bukti pencatatan bagi pekerja yang pernah bekerja. "
+                    "Berbeda dengan Kartu Kuning yang untuk pencari kerja pertama kali.\n\n"
+                    "Syarat perpanjangan AK1:\n"
+                    "1. Fotokopi AK1 lama\n"
+                    "2. Fotokopi KTP\n"
+                    "3. Pas foto 4x6 (2 lembar)\n"
+                    "4. Surat pengantar dari perusahaan terakhir"
+                )
+            },
+            {
+                "kata_kunci": "perbedaan ak1 dan kartu kuning",
+                "jawaban": (
+                    "Perbedaan AK1 dan Kartu Kuning:\n"
+                    "1. **Kartu Kuning (AK/I)**: Untuk pencari kerja pertama kali (belum pernah bekerja)\n"
+                    "2. **AK1**: Untuk pekerja yang pernah bekerja (memiliki pengalaman kerja)\n\n"
+                    "Keduanya adalah dokumen penting dalam dunia ketenagakerjaan, "
+                    "tapi digunakan pada fase berbeda dalam karir seseorang 😊"
+                )
+            },
+            {
+                "kata_kunci": "pelatihan",
+                "jawaban": (
+                    "Program pelatihan gratis DISNAKER Bartim:\n"
+                    "{daftar_pelatihan}\n\n"
+                    "Pendaftaran:\n{pendaftaran_pelatihan}\n\n"
+                    "Info lengkap: {website}"
+                )
+            }
+        ]
+    }
 }
 
+@profiled
 def load_knowledge():
     """Memuat knowledge base dari file JSON"""
     if not os.path.exists(KNOWLEDGE_FILE):
@@ -74,6 +169,7 @@ def load_knowledge():
         print(f"Error loading knowledge: {str(e)}")
         return DEFAULT_KNOWLEDGE
 
+@profiled
 def save_knowledge(data):
     """Menyimpan knowledge base ke file JSON"""
     try:
@@ -82,11 +178,30 @@ def save_knowledge(data):
         
         with open(KNOWLEDGE_FILE, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
+        _bump_revision()
         return True
     except Exception as e:
         print(f"Error saving knowledge: {str(e)}")
         return False
 
+def _bump_revision():
+    global _knowledge_revision, _file_checked_at
+    _knowledge_revision += 1
+    _file_checked_at = None
+
+def get_knowledge_revision():
+    """Mengembalikan penanda versi knowledge base (berubah jika file diubah)"""
+    global _file_stamp, _file_checked_at
+    now = time.monotonic()
+    if _file_checked_at is None or now - _file_checked_at >= REVISION_CHECK_INTERVAL:
+        try:
+            stat = os.stat(KNOWLEDGE_FILE)
+            _file_stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            _file_stamp = (None, None)
+        _file_checked_at = now
+    return (_knowledge_revision,) + _file_stamp
+
 def add_update(info_baru):
     """Menambahkan update baru ke knowledge base"""
     knowledge = load_knowledge()
@@ -105,6 +220,7 @@ def add_update(info_baru):
     
     return save_knowledge(knowledge)
 
+@profiled
 def get_knowledge_context():
     """Mengembalikan ringkasan knowledge base untuk prompt AI"""
     knowledge = load_knowledge()
@@ -133,11 +249,19 @@ def get_knowledge_context():
 
 def format_list(items):
     """Format list menjadi string dengan bullet points"""
-    return "\n".join([f"- {item}" for item in items])
+    return "\n".join([f"- {item}" for item in items or []])
 
 def format_training(items):
-    """Format khusus untuk jenis pelatihan"""
-    return "\n".join([f"- {item['nama']} ({item['durasi']})" for item in items])
+    """Format khusus untuk jenis pelatihan (durasi boleh kosong)"""
+    lines = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            lines.append(f"- {item}")
+        elif item.get('durasi'):
+            lines.append(f"- {item.get('nama', '')} ({item['durasi']})")
+        else:
+            lines.append(f"- {item.get('nama', '')}")
+    return "\n".join(lines)
 
 # Inisialisasi: jika file belum ada, buat dengan data default
 if not os.path.exists(KNOWLEDGE_FILE):
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import zlib
+from threading import Lock
+
+import numpy as np
+
+from knowledge import (
+    format_list,
+    format_training,
+    get_knowledge_revision,
+    load_knowledge,
+)
+from profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+# Lokasi indeks vektor (matrix .npy di-memory-map, idf .npy, dan sidecar JSON)
+LOCAL_INDEX_PREFIX = os.getenv("LOCAL_INDEX_PREFIX", "disnaker_local_index")
+INDEX_DIM = 4096  # Jumlah bucket hashing n-gram
+CHAR_NGRAM_SIZES = (3, 4)
+
+STOPWORDS = {
+    'apa', 'yang', 'di', 'dan', 'ke', 'dari', 'untuk', 'saya', 'aku', 'mau',
+    'ingin', 'bisa', 'tolong', 'mohon', 'pak', 'bu', 'min', 'kak', 'dong',
+    'ya', 'kah', 'itu', 'ini', 'ada', 'gimana', 'bagaimana', 'dengan'
+}
+
+# Label bagian knowledge: (judul untuk jawaban, kata kunci tambahan untuk pencarian)
+INFO_LABELS = {
+    'alamat': ("Alamat kantor", "alamat lokasi kantor letak dimana"),
+    'telepon': ("Telepon", "telepon nomor kontak hubungi telp"),
+    'email': ("Email", "email surel kontak"),
+    'website': ("Website", "website situs web online"),
+    'jam_operasional': ("Jam pelayanan", "jam buka operasional pelayanan kapan buka tutup"),
+}
+LAYANAN_LABELS = {
+    'deskripsi': ("Keterangan", "apa itu pengertian fungsi"),
+    'syarat': ("Syarat", "syarat persyaratan dokumen berkas"),
+    'prosedur': ("Prosedur", "prosedur cara langkah alur proses buat"),
+    'biaya': ("Biaya", "biaya tarif bayar harga gratis"),
+    'jenis_pelatihan': ("Jenis pelatihan", "jenis pelatihan program kursus macam"),
+    'syarat_peserta': ("Syarat peserta", "syarat peserta persyaratan ikut"),
+    'pendaftaran': ("Pendaftaran", "pendaftaran cara daftar mendaftar"),
+}
+
+_index = None
+_index_revision = None
+_index_lock = Lock()
+
+def _format_value(value):
+    """Ubah nilai knowledge (string/list) menjadi teks jawaban"""
+    if isinstance(value, list):
+        if value and isinstance(value[0], dict):
+            return format_training(value)
+        return format_list(value)
+    return str(value)
+
+def build_passages(knowledge):
+    """Pecah knowledge base menjadi passage (teks pencarian, kata kunci, jawaban).
+
+    'kunci' adalah kata penanda maksud passage (label bagian, pertanyaan FAQ,
+    isi update); jawaban lokal hanya dianggap yakin jika pertanyaan menyentuhnya.
+    """
+    passages = []
+
+    for key, value in knowledge.get('info_dinas', {}).items():
+        title, hints = INFO_LABELS.get(key, (key.replace('_', ' ').title(), key.replace('_', ' ')))
+        passages.append({
+            "teks": f"{hints} {value}",
+            "kunci": hints,
+            "jawaban": f"{title}: {value}"
+        })
+
+    for key, layanan in knowledge.get('layanan', {}).items():
+        nama = layanan.get('nama', key.replace('_', ' '))
+        topik = f"{key.replace('_', ' ')} {nama}"
+        for field, value in layanan.items():
+            if field == 'nama' or not value:
+                continue
+            title, hints = LAYANAN_LABELS.get(field, (field.replace('_', ' ').title(), field.replace('_', ' ')))
+            text = _format_value(value)
+            passages.append({
+                "teks": f"{topik} {hints} {hints} {text}",
+                "kunci": hints,
+                "jawaban": f"*{nama}* - {title}:\n{text}"
+            })
+
+    for item in knowledge.get('faq', []):
+        if item.get('pertanyaan') and item.get('jawaban'):
+            passages.append({
+                "teks": item['pertanyaan'],
+                "kunci": item['pertanyaan'],
+                "jawaban": item['jawaban']
+            })
+
+    for update in knowledge.get('update_terbaru', []):
+        passages.append({
+            "teks": f"info terbaru pengumuman {update}",
+            "kunci": f"info terbaru pengumuman {update}",
+            "jawaban": f"Info terbaru: {update}"
+        })
+
+    return passages
+
+def _words(text):
+    """Kata bermakna (tanpa stopword) dari teks"""
+    return [w for w in re.findall(r"\w+", text.lower()) if w not in STOPWORDS]
+
+def _features(text):
+    """Ekstrak fitur kata dan n-gram karakter dari teks"""
+    words = _words(text)
+    features = list(words)
+    for word in words:
+        padded = f" {word} "
+        for n in CHAR_NGRAM_SIZES:
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return features
+
+def _hash_counts(text):
+    """Hitung frekuensi fitur ter-hash (crc32 agar stabil antar proses)"""
+    buckets = [zlib.crc32(f.encode('utf-8')) % INDEX_DIM for f in _features(text)]
+    counts = np.bincount(np.asarray(buckets, dtype=np.int64), minlength=INDEX_DIM)
+    return np.log1p(counts.astype(np.float32))
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _signature(knowledge):
+    """Hash isi knowledge, agar edit manual yang tidak mengubah meta tetap terdeteksi"""
+    content = json.dumps(knowledge, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def build_index(knowledge):
+    """Bangun matrix TF-IDF ter-hash dan simpan ke disk"""
+    passages = build_passages(knowledge)
+    if passages:
+        tf = np.vstack([_hash_counts(p['teks']) for p in passages])
+    else:
+        tf = np.zeros((0, INDEX_DIM), dtype=np.float32)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = (np.log((1 + len(passages)) / (1 + df)) + 1).astype(np.float32)
+    matrix = _normalize(tf * idf).astype(np.float32)
+
+    # Tulis ke file sementara lalu rename agar worker lain tidak membaca file setengah jadi
+    for suffix, array in (("matrix", matrix), ("idf", idf)):
+        tmp_path = f"{LOCAL_INDEX_PREFIX}.{suffix}.tmp.npy"
+        np.save(tmp_path, array)
+        os.replace(tmp_path, f"{LOCAL_INDEX_PREFIX}.{suffix}.npy")
+
+    tmp_path = f"{LOCAL_INDEX_PREFIX}.json.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "signature": _signature(knowledge),
+            "dim": INDEX_DIM,
+            "passages": [p['jawaban'] for p in passages],
+            "keys": [p['kunci'] for p in passages]
+        }, f, ensure_ascii=False)
+    os.replace(tmp_path, f"{LOCAL_INDEX_PREFIX}.json")
+
+    logger.info(f"Indeks lokal dibangun: {len(passages)} passage")
+
+def _load_index(knowledge, rebuild=True):
+    """Muat indeks dari disk (memory-mapped), bangun ulang jika usang"""
+    try:
+        with open(f"{LOCAL_INDEX_PREFIX}.json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('signature') != _signature(knowledge) or meta.get('dim') != INDEX_DIM:
+            raise ValueError("indeks usang")
+        return {
+            "matrix": np.load(f"{LOCAL_INDEX_PREFIX}.matrix.npy", mmap_mode='r'),
+            "idf": np.load(f"{LOCAL_INDEX_PREFIX}.idf.npy"),
+            "answers": meta['passages'],
+            "keys": [frozenset(_words(key)) for key in meta['keys']]
+        }
+    except (OSError, ValueError, KeyError) as e:
+        if not rebuild:
+            raise
+        logger.info(f"Membangun ulang indeks lokal: {str(e)}")
+        build_index(knowledge)
+        return _load_index(knowledge, rebuild=False)
+
+@profiled
+def get_index():
+    """Ambil indeks lokal, muat ulang jika knowledge sudah diperbarui"""
+    global _index, _index_revision
+
+    revision = get_knowledge_revision()
+    if _index is not None and _index_revision == revision:
+        return _index
+
+    with _index_lock:
+        if _index is None or _index_revision != revision:
+            _index = _load_index(load_knowledge())
+            _index_revision = revision
+    return _index
+
+@profiled
+def match_locally(question):
+    """Cari passage terdekat; kembalikan dict jawaban, skor, margin, dan kecocokan kunci"""
+    try:
+        index = get_index()
+    except Exception as e:
+        logger.error(f"Local index error: {str(e)}")
+        return None
+
+    if not index or not index['answers']:
+        return None
+
+    query = _normalize(_hash_counts(question) * index['idf'])
+    if not query.any():
+        return None
+
+    scores = index['matrix'] @ query
+    best = int(np.argmax(scores))
+    score = float(scores[best])
+    if math.isnan(score):
+        return None
+
+    runner_up = float(np.partition(scores, -2)[-2]) if len(scores) > 1 else 0.0
+    return {
+        "answer": index['answers'][best],
+        "score": score,
+        "margin": score - runner_up,
+        "key_match": bool(index['keys'][best] & set(_words(question)))
+    }
+
+def answer_locally(question):
+    """Jawaban passage terdekat tanpa syarat keyakinan, kembalikan (jawaban, skor)"""
+    match = match_locally(question)
+    if match is None:
+        return None, 0.0
+    return match['answer'], match['score']
+
+def confident_answer(question, min_score, min_margin):
+    """Jawaban lokal hanya jika skor, jarak ke kandidat kedua, dan kata kunci meyakinkan"""
+    match = match_locally(question)
+    if (
+        match is None
+        or match['score'] < min_score
+        or match['margin'] < min_margin
+        or not match['key_match']
+    ):
+        return None, match['score'] if match else 0.0
+    return match['answer'], match['score']
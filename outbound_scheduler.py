@@ -0,0 +1,156 @@
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from threading import Condition
+
+logger = logging.getLogger(__name__)
+
+# Jalur pengiriman: bobot bagi throughput dan batas umur antrian (SLO, detik)
+DEFAULT_LANES = {
+    "interactive": {"weight": 8, "slo": 5},
+    "admin": {"weight": 4, "slo": 10},
+    "broadcast": {"weight": 1, "slo": 900},
+}
+DEFAULT_LANE = "interactive"
+
+class OutboundScheduler:
+    """Antrian pesan keluar berprioritas dengan pembagian throughput berbobot.
+
+    Setiap jalur FIFO di dalamnya. Jalur dipilih dengan weighted round-robin,
+    kecuali ada jalur yang pesan terdepannya sudah melewati SLO; jalur itu
+    didahulukan agar jalur berbobot kecil tidak kelaparan.
+
+    Pesan tertunda (mis. retry setelah 429) menunggu di heap jalurnya sendiri
+    sehingga tidak menahan pesan lain, lalu masuk ke depan jalur begitu siap.
+    Dengan begitu retry balasan warga tetap berprioritas interaktif.
+    """
+
+    def __init__(self, lanes=None, rate_per_sec=3.0):
+        self._lanes = {
+            name: {
+                "weight": config["weight"],
+                "slo": config["slo"],
+                "items": deque(),
+                "delayed": [],
+                "current": 0,
+                "sent": 0,
+                "breaches": 0
+            }
+            for name, config in (lanes or DEFAULT_LANES).items()
+        }
+        self._interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self._next_send_at = 0.0
+        self._paused_until = 0.0
+        self._cond = Condition()
+        self._seq = itertools.count()
+
+    def put(self, message_data, lane=None, delay=0):
+        """Masukkan pesan ke jalur tertentu, opsional ditunda beberapa detik"""
+        lane = lane or message_data.get('lane') or DEFAULT_LANE
+        if lane not in self._lanes:
+            logger.warning(f"Jalur {lane} tidak dikenal, memakai {DEFAULT_LANE}")
+            lane = DEFAULT_LANE
+        message_data['lane'] = lane
+
+        ready_at = time.monotonic() + delay
+        with self._cond:
+            if delay > 0:
+                heapq.heappush(self._lanes[lane]['delayed'], (ready_at, next(self._seq), message_data))
+            else:
+                self._lanes[lane]['items'].append((ready_at, message_data))
+            self._cond.notify()
+
+    def get(self):
+        """Ambil pesan berikutnya, memblokir sampai ada pesan dan kuota kirim tersedia"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                resume_at = max(self._next_send_at, self._paused_until)
+                if now < resume_at:
+                    self._cond.wait(timeout=resume_at - now)
+                    continue
+
+                self._promote_delayed(now)
+                lane = self._pick_lane(now)
+                if lane is None:
+                    self._cond.wait(timeout=self._next_ready_in(now))
+                    continue
+
+                ready_at, message_data = lane['items'].popleft()
+                age = now - ready_at
+                lane['sent'] += 1
+                if age > lane['slo']:
+                    lane['breaches'] += 1
+                    logger.warning(
+                        f"Jalur {message_data['lane']} melewati SLO: "
+                        f"pesan menunggu {age:.1f} detik (batas {lane['slo']} detik)"
+                    )
+                self._next_send_at = now + self._interval
+                return message_data
+
+    def requeue_rate_limited(self, message_data, retry_delay, backoff_seconds):
+        """Tangani error 429: tunda pesan di jalur asalnya dan jeda semua pengiriman"""
+        message_data['attempt'] = message_data.get('attempt', 0) + 1
+        self.put(message_data, delay=retry_delay)
+        self.backoff(backoff_seconds)
+
+    def backoff(self, seconds):
+        """Hentikan semua pengiriman sementara (mis. setelah error 429)"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def _promote_delayed(self, now):
+        """Pindahkan pesan tertunda yang sudah siap ke depan jalurnya"""
+        for lane in self._lanes.values():
+            due = []
+            while lane['delayed'] and lane['delayed'][0][0] <= now:
+                ready_at, _, message_data = heapq.heappop(lane['delayed'])
+                due.append((ready_at, message_data))
+            lane['items'].extendleft(reversed(due))
+
+    def _pick_lane(self, now):
+        ready = [lane for lane in self._lanes.values() if lane['items']]
+        if not ready:
+            return None
+
+        # Perlindungan starvation: jalur yang paling jauh melewati SLO didahulukan
+        overdue = [lane for lane in ready if now - lane['items'][0][0] > lane['slo']]
+        if overdue:
+            return max(overdue, key=lambda lane: (now - lane['items'][0][0]) / lane['slo'])
+
+        # Smooth weighted round-robin di antara jalur yang siap
+        total = sum(lane['weight'] for lane in ready)
+        for lane in ready:
+            lane['current'] += lane['weight']
+        chosen = max(ready, key=lambda lane: lane['current'])
+        chosen['current'] -= total
+        return chosen
+
+    def _next_ready_in(self, now):
+        """Waktu tunggu sampai pesan tertunda terdekat siap, None jika antrian kosong"""
+        pending = [lane['delayed'][0][0] for lane in self._lanes.values() if lane['delayed']]
+        pending += [lane['items'][0][0] for lane in self._lanes.values() if lane['items']]
+        return max(min(pending) - now, 0.0) if pending else None
+
+    def stats(self):
+        """Ringkasan kedalaman antrian dan umur pesan tertua per jalur"""
+        now = time.monotonic()
+        with self._cond:
+            return {
+                name: {
+                    "depth": len(lane['items']) + len(lane['delayed']),
+                    "delayed": len(lane['delayed']),
+                    "oldest_age": round(max(now - lane['items'][0][0], 0.0), 1) if lane['items'] else 0.0,
+                    "slo": lane['slo'],
+                    "sent": lane['sent'],
+                    "slo_breaches": lane['breaches']
+                }
+                for name, lane in self._lanes.items()
+            }
+
+    def qsize(self):
+        with self._cond:
+            return sum(len(lane['items']) + len(lane['delayed']) for lane in self._lanes.values())
@@ -0,0 +1,125 @@
+import contextvars
+import functools
+import os
+import random
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from threading import Lock
+
+# ===================== KONFIGURASI =====================
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0.0 - 1.0
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "200"))
+PROFILE_HEADER = "X-Profile"  # "X-Profile: 1" + X-Admin-Token memaksa tracing satu request
+
+# Trace yang sedang aktif di konteks ini; None berarti profiling mati (jalur cepat)
+_active_trace = contextvars.ContextVar("active_trace", default=None)
+
+# Ring buffer trace yang sudah selesai
+_traces = deque(maxlen=PROFILE_BUFFER_SIZE)
+_traces_lock = Lock()
+
+def _now():
+    return time.perf_counter(), time.thread_time()
+
+def _push(trace, name):
+    wall, cpu = _now()
+    trace['_frames'].append([name, wall, cpu, 0.0, 0.0])
+
+def _pop(trace):
+    wall_end, cpu_end = _now()
+    frames = trace['_frames']
+    name, wall_start, cpu_start, child_wall, child_cpu = frames[-1]
+    wall = wall_end - wall_start
+    cpu = cpu_end - cpu_start
+
+    # Simpan waktu "self" per stack (format collapsed stack untuk flame graph)
+    path = ";".join(frame[0] for frame in frames)
+    trace['wall_us'][path] += int((wall - child_wall) * 1_000_000)
+    trace['cpu_us'][path] += int((cpu - child_cpu) * 1_000_000)
+
+    frames.pop()
+    if frames:
+        frames[-1][3] += wall
+        frames[-1][4] += cpu
+    return wall, cpu
+
+def profiled(func):
+    """Decorator: catat wall dan CPU time fungsi jika request ini sedang di-trace"""
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = _active_trace.get()
+        if trace is None:
+            return func(*args, **kwargs)
+        _push(trace, name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _pop(trace)
+
+    return wrapper
+
+def start_trace(root_name, force=False):
+    """Mulai trace jika dipaksa atau terpilih sampling; kembalikan id trace atau None"""
+    if not force and (PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE):
+        return None
+
+    trace = {
+        "id": uuid.uuid4().hex[:12],
+        "ts": datetime.now().isoformat(timespec='seconds'),
+        "root": root_name,
+        "wall_us": Counter(),
+        "cpu_us": Counter(),
+        "_frames": []
+    }
+    _push(trace, root_name)
+    _active_trace.set(trace)
+    return trace['id']
+
+def finish_trace():
+    """Tutup trace aktif dan simpan ke ring buffer"""
+    trace = _active_trace.get()
+    if trace is None:
+        return None
+    _active_trace.set(None)
+
+    # Tutup frame yang tersisa (mis. karena exception) sampai ke root
+    wall = cpu = 0.0
+    while trace['_frames']:
+        wall, cpu = _pop(trace)
+    del trace['_frames']
+    trace['total_wall_ms'] = round(wall * 1000, 2)
+    trace['total_cpu_ms'] = round(cpu * 1000, 2)
+
+    with _traces_lock:
+        _traces.append(trace)
+    return trace['id']
+
+def list_traces():
+    """Ringkasan trace di ring buffer, terbaru lebih dulu"""
+    with _traces_lock:
+        traces = list(_traces)
+    return [
+        {
+            "id": t['id'],
+            "ts": t['ts'],
+            "root": t['root'],
+            "total_wall_ms": t['total_wall_ms'],
+            "total_cpu_ms": t['total_cpu_ms']
+        }
+        for t in reversed(traces)
+    ]
+
+def collapsed_stacks(metric="wall", trace_id=None):
+    """Gabungkan trace menjadi format collapsed stack (flamegraph.pl / speedscope)"""
+    key = "cpu_us" if metric == "cpu" else "wall_us"
+    with _traces_lock:
+        traces = [t for t in _traces if trace_id is None or t['id'] == trace_id]
+
+    totals = Counter()
+    for trace in traces:
+        totals.update(trace[key])
+    return "\n".join(f"{path} {value}" for path, value in sorted(totals.items()) if value > 0)
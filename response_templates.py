@@ -0,0 +1,152 @@
+import logging
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+
+from knowledge import (
+    DEFAULT_KNOWLEDGE,
+    format_list,
+    format_training,
+    get_knowledge_revision,
+    load_knowledge,
+)
+from profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+WIB = timezone(timedelta(hours=7))
+WAKTU_HARI = ("pagi", "siang", "sore", "malam")
+
+# Hasil kompilasi template, dibangun ulang hanya saat revisi knowledge berubah
+_compiled = None
+_compiled_revision = None
+_compile_lock = Lock()
+
+def format_numbered(items):
+    """Format list menjadi string bernomor"""
+    return "\n".join(f"{i}. {item}" for i, item in enumerate(items, 1))
+
+def get_time_of_day(now=None):
+    """Tentukan pagi/siang/sore/malam berdasarkan jam WIB"""
+    hour = (now or datetime.now(WIB)).astimezone(WIB).hour
+    if 5 <= hour < 11:
+        return "pagi"
+    if 11 <= hour < 15:
+        return "siang"
+    if 15 <= hour < 19:
+        return "sore"
+    return "malam"
+
+def build_template_context(knowledge):
+    """Kumpulkan nilai placeholder template dari data knowledge"""
+    info = knowledge.get('info_dinas') or {}
+    layanan = knowledge.get('layanan') or {}
+    kartu_kuning = layanan.get('kartu_kuning') or {}
+    pelatihan = layanan.get('pelatihan_vokasi') or {}
+
+    return {
+        "alamat": info.get('alamat', ''),
+        "telepon": info.get('telepon', ''),
+        "email": info.get('email', ''),
+        "website": info.get('website', ''),
+        "jam_operasional": info.get('jam_operasional', ''),
+        "nama_kartu_kuning": kartu_kuning.get('nama', 'Kartu Kuning'),
+        "syarat_kartu_kuning": format_numbered(kartu_kuning.get('syarat', [])),
+        "prosedur_kartu_kuning": kartu_kuning.get('prosedur', ''),
+        "biaya_kartu_kuning": kartu_kuning.get('biaya', ''),
+        "daftar_pelatihan": format_training(pelatihan.get('jenis_pelatihan', [])),
+        "syarat_pelatihan": format_list(pelatihan.get('syarat_peserta', [])),
+        "pendaftaran_pelatihan": pelatihan.get('pendaftaran', ''),
+    }
+
+def _render(text, context):
+    """Isi placeholder template, kembalikan teks mentah jika template rusak"""
+    try:
+        return text.format(**context)
+    except (KeyError, IndexError, ValueError) as e:
+        logger.error(f"Template error ({str(e)}): {text[:50]}")
+        return text
+
+def _compile_triggers(words):
+    """Gabungkan kata pemicu menjadi satu regex pencocokan substring"""
+    if not words:
+        return None
+    return re.compile("|".join(re.escape(w.lower()) for w in words))
+
+def _compile_per_time_of_day(responses, context):
+    """Render jawaban untuk setiap waktu hari agar tidak perlu format ulang"""
+    return {
+        waktu: [_render(text, dict(context, waktu=waktu)) for text in responses]
+        for waktu in WAKTU_HARI
+    }
+
+def compile_templates(knowledge):
+    """Kompilasi template respons dari knowledge menjadi pola dan teks siap kirim"""
+    templates = knowledge.get('template_respons') or DEFAULT_KNOWLEDGE['template_respons']
+    context = build_template_context(knowledge)
+
+    compiled = {}
+    for name in ('sapaan', 'terima_kasih'):
+        default = DEFAULT_KNOWLEDGE['template_respons'][name]
+        section = templates.get(name) or default
+        # Pemicu tanpa jawaban akan membuat balasan kosong; pakai jawaban default
+        compiled[name] = {
+            "pattern": _compile_triggers(section.get('pemicu', [])),
+            "responses": _compile_per_time_of_day(section.get('jawaban') or default['jawaban'], context),
+        }
+
+    # Urutan dipertahankan: kata kunci pertama yang cocok yang dipakai
+    compiled['umum'] = [
+        (
+            re.compile(r'\b' + re.escape(item['kata_kunci'].lower()) + r'\b'),
+            _render(item['jawaban'], context),
+        )
+        for item in templates.get('umum', [])
+        if item.get('kata_kunci') and item.get('jawaban')
+    ]
+    return compiled
+
+@profiled
+def get_templates():
+    """Ambil template terkompilasi, muat ulang jika knowledge sudah diperbarui"""
+    global _compiled, _compiled_revision
+
+    revision = get_knowledge_revision()
+    if _compiled is not None and _compiled_revision == revision:
+        return _compiled
+
+    with _compile_lock:
+        if _compiled is None or _compiled_revision != revision:
+            try:
+                _compiled = compile_templates(load_knowledge())
+                logger.info(f"Template respons dikompilasi (revisi {revision})")
+            except Exception as e:
+                # Knowledge rusak tidak boleh mematikan semua balasan:
+                # pakai hasil kompilasi terakhir, atau default jika belum ada
+                logger.error(f"Gagal kompilasi template, memakai versi sebelumnya: {str(e)}")
+                if _compiled is None:
+                    _compiled = compile_templates(DEFAULT_KNOWLEDGE)
+            # Revisi tetap dicatat agar tidak mencoba ulang di setiap pesan
+            _compiled_revision = revision
+    return _compiled
+
+@profiled
+def matches_template(name, message):
+    """Cek apakah pesan mengandung salah satu pemicu template"""
+    pattern = get_templates()[name]['pattern']
+    return bool(pattern and pattern.search(message.lower()))
+
+@profiled
+def render_template(name):
+    """Pilih salah satu jawaban template sesuai waktu saat ini"""
+    responses = get_templates()[name]['responses'][get_time_of_day()]
+    return random.choice(responses) if responses else None
+
+@profiled
+def match_common_response(message_lower):
+    """Cari jawaban umum berdasarkan kata kunci, None jika tidak ada"""
+    for pattern, response in get_templates()['umum']:
+        if pattern.search(message_lower):
+            return response
+    return None
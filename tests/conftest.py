@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Modul aplikasi berada di root repo (tanpa package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def knowledge_file(tmp_path, monkeypatch):
+    """Arahkan knowledge base ke file sementara"""
+    import knowledge
+    path = tmp_path / "knowledge.json"
+    monkeypatch.setattr(knowledge, "KNOWLEDGE_FILE", str(path))
+    # Test mengedit file lalu langsung membaca; jangan cache stat()
+    monkeypatch.setattr(knowledge, "REVISION_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(knowledge, "_file_checked_at", None)
+    return path
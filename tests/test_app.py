@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    pytest.importorskip("flask")
+    pytest.importorskip("twilio")
+    # Import app membuat file knowledge/indeks/job di direktori kerja
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    return app
+
+@pytest.fixture
+def client(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_API_TOKEN", "rahasia")
+    return app_module.app.test_client()
+
+@pytest.mark.parametrize("path", ["/admin/profile/traces", "/admin/profile/stacks"])
+def test_profile_endpoints_require_admin_token(client, path):
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Admin-Token": "salah"}).status_code == 403
+    assert client.get(path, headers={"X-Admin-Token": "rahasia"}).status_code == 200
+
+def test_profile_endpoints_closed_when_token_unset(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_API_TOKEN", None)
+    assert client.get("/admin/profile/traces", headers={"X-Admin-Token": ""}).status_code == 403
+
+def test_no_groq_fallback_rejects_off_target_local_match(app_module, knowledge_file, tmp_path, monkeypatch):
+    import local_answer
+    monkeypatch.setattr(local_answer, "LOCAL_INDEX_PREFIX", str(tmp_path / "index"))
+    monkeypatch.setattr(local_answer, "_index", None)
+
+    response = app_module.answer_from_knowledge("apa itu transmigrasi di disnaker")
+    assert response.startswith("Maaf, saya belum bisa menjawab")
+
+    response = app_module.answer_from_knowledge("syarat kartu kuning")
+    assert response.startswith("*Kartu Pencari Kerja (AK-1)* - Syarat")
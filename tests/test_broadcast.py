@@ -0,0 +1,154 @@
+import pytest
+
+import broadcast
+
+class AckingQueue:
+    """Antrian palsu: setiap pesan langsung dianggap terkirim"""
+
+    def __init__(self):
+        self.sent = []
+        self.runner = None
+
+    def put(self, message_data, lane=None, delay=0):
+        self.sent.append(message_data['to'])
+        self.runner.message_done(message_data)
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    monkeypatch.setattr(broadcast, "BROADCAST_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(broadcast, "SUBSCRIPTION_FILE", str(tmp_path / "subs.json"))
+    monkeypatch.setattr(broadcast, "BROADCAST_CHUNK_SIZE", 10)
+    monkeypatch.setattr(broadcast, "_subscriptions", None)
+    queue = AckingQueue()
+    runner = broadcast.BroadcastRunner(queue)
+    # Jangan jalankan thread background; test memanggil _run_job langsung
+    monkeypatch.setattr(runner, "start", lambda: None)
+    queue.runner = runner
+    return runner
+
+def _subscribe(count):
+    for i in range(count):
+        broadcast.subscribe(f"62{i:04d}", "pelatihan")
+
+def test_implicit_interest_is_mapped_from_whole_message(runner):
+    broadcast.record_interest("620001", "lowongan kerja disnaker")
+    broadcast.record_interest("620002", "pelatihan tenaga kerja")
+    broadcast.record_interest("620003", "info bursa kerja")
+    broadcast.record_interest("620004", "saya pencari kerja, ada pelatihan?")
+
+    assert broadcast.get_recipients("lowongan") == ["620001", "620003"]
+    assert broadcast.get_recipients("pelatihan") == ["620002", "620004"]
+    assert broadcast.get_recipients("kartu_kuning") == ["620004"]
+
+def test_opt_out_blocks_implicit_interest(runner):
+    broadcast.unsubscribe("620001")
+    broadcast.record_interest("620001", "info pelatihan")
+    assert broadcast.get_recipients("pelatihan") == []
+
+def test_job_checkpoints_each_chunk_and_finishes(runner):
+    _subscribe(25)
+    job = runner.create_job("pelatihan", "Pendaftaran dibuka")
+
+    runner._run_job(job)
+
+    saved = broadcast._load_job(job['id'])
+    assert saved['status'] == "done"
+    assert saved['cursor'] == 25
+    assert len(runner._queue.sent) == 25
+
+def test_job_resumes_from_saved_cursor(runner):
+    _subscribe(25)
+    job = runner.create_job("pelatihan", "Pendaftaran dibuka")
+    # Simulasi crash setelah checkpoint chunk pertama
+    job['cursor'] = 10
+    job['status'] = "running"
+    broadcast._save_job(job)
+
+    next_job, lock_file = runner._next_job()
+    try:
+        runner._run_job(next_job)
+    finally:
+        broadcast._unlock_job(lock_file)
+
+    assert runner._queue.sent == [f"62{i:04d}" for i in range(10, 25)]
+    assert broadcast._load_job(job['id'])['cursor'] == 25
+
+def test_cursor_waits_for_sender_progress(runner):
+    _subscribe(15)
+    job = runner.create_job("pelatihan", "Info")
+    runner._run_id = "run-1"
+    runner._inflight = {10: 0, 15: 2}
+
+    runner._checkpoint(job)
+    assert job['cursor'] == 10
+    assert broadcast._load_job(job['id'])['cursor'] == 10
+
+    runner.message_done({'chunk_end': 15, 'run_id': "run-1"})
+    runner.message_done({'chunk_end': 15, 'run_id': "run-1"})
+    runner._checkpoint(job)
+    assert job['cursor'] == 15
+
+def test_locked_job_is_skipped_by_other_runner(runner):
+    _subscribe(3)
+    job = runner.create_job("pelatihan", "Info")
+    lock_file = broadcast._try_lock_job(job['id'])
+    try:
+        assert runner._next_job() == (None, None)
+    finally:
+        broadcast._unlock_job(lock_file)
+
+def test_failed_job_can_be_resumed(runner):
+    _subscribe(3)
+    job = runner.create_job("pelatihan", "Info")
+    job['status'] = "failed"
+    job['error'] = "disk penuh"
+    broadcast._save_job(job)
+
+    resumed = runner.resume_job(job['id'])
+    assert resumed['status'] == "pending"
+    assert 'error' not in broadcast._load_job(job['id'])
+
+def test_acks_from_another_run_do_not_advance_cursor(runner):
+    _subscribe(15)
+    job = runner.create_job("pelatihan", "Info")
+    runner._run_id = "run-baru"
+    runner._inflight = {10: 1}
+
+    # Pesan sisa job gagal dengan cursor akhir chunk yang sama
+    runner.message_done({'chunk_end': 10, 'job_id': "job-lama", 'run_id': "run-lama"})
+    runner._checkpoint(job)
+    assert job['cursor'] == 0
+
+    runner.message_done({'chunk_end': 10, 'job_id': job['id'], 'run_id': "run-baru"})
+    runner._checkpoint(job)
+    assert job['cursor'] == 10
+
+def test_opt_out_during_job_stops_later_messages(runner):
+    _subscribe(25)
+    job = runner.create_job("pelatihan", "Info")
+    queue = runner._queue
+    put = queue.put
+
+    def put_and_unsubscribe(message_data, lane=None, delay=0):
+        # Warga 620020 membalas /berhenti saat chunk pertama dikirim
+        broadcast.unsubscribe("620020")
+        put(message_data, lane, delay)
+
+    queue.put = put_and_unsubscribe
+    runner._run_job(job)
+
+    assert "620020" not in queue.sent
+    assert len(queue.sent) == 24
+    assert broadcast._load_job(job['id'])['cursor'] == 25
+
+@pytest.mark.parametrize("keyword, topic", [
+    ("cari kerja", "lowongan"),
+    ("Bursa  Kerja", "lowongan"),
+    ("pencari kerja", "kartu_kuning"),
+    ("kartu kuning", "kartu_kuning"),
+    ("kartu_kuning", "kartu_kuning"),
+    ("cari_kerja", "lowongan"),
+    ("sembako", None),
+])
+def test_topic_for_keyword_treats_space_and_underscore_alike(keyword, topic):
+    assert broadcast.topic_for_keyword(keyword) == topic
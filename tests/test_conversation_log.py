@@ -0,0 +1,46 @@
+import multiprocessing
+import os
+from datetime import datetime
+
+import conversation_log
+
+def test_note_upstream_sums_counters_and_assigns_other_fields():
+    turn = conversation_log.start_turn("6281234", "halo")
+    conversation_log.note_upstream("groq", 10, groq_tokens=5, groq_error="exception")
+    conversation_log.note_upstream("groq", 20, groq_tokens=7, groq_error=429)
+    conversation_log._current_turn.set(None)
+
+    assert turn['groq_tokens'] == 12
+    assert turn['groq_error'] == 429
+    assert turn['upstream'] == ["groq", "groq"]
+    assert turn['upstream_ms']['groq'] == 30
+
+def test_phone_hash_is_keyed(monkeypatch):
+    plain = conversation_log.hash_number("6281234")
+    monkeypatch.setattr(conversation_log, "LOG_HASH_KEY", b"kunci-lain")
+    assert conversation_log.hash_number("6281234") != plain
+
+def test_message_text_not_stored_by_default():
+    turn = conversation_log.start_turn("6281234", "rahasia")
+    conversation_log._current_turn.set(None)
+    assert turn['pesan'] is None
+    assert turn['pesan_chars'] == 7
+
+def test_concurrent_processes_append_readable_members(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversation_log, "LOG_DIR", str(tmp_path))
+    # Batch besar (melebihi buffer tulis) dari beberapa proses ke file yang sama
+    batch = [{"ts": "2026-10-01T08:00:00", "topic": os.urandom(1000).hex(), "n": i} for i in range(200)]
+
+    def writer():
+        for _ in range(5):
+            conversation_log._write_batch(batch, {})
+
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=writer) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    events = list(conversation_log.iter_events(days=1, until=datetime(2026, 10, 1)))
+    assert len(events) == 4 * 5 * 200
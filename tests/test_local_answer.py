@@ -0,0 +1,83 @@
+import copy
+import json
+import os
+
+import pytest
+
+import knowledge
+import local_answer
+
+@pytest.fixture
+def local_index(knowledge_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(local_answer, "LOCAL_INDEX_PREFIX", str(tmp_path / "index"))
+    monkeypatch.setattr(local_answer, "_index", None)
+    knowledge.save_knowledge(copy.deepcopy(knowledge.DEFAULT_KNOWLEDGE))
+    return tmp_path / "index"
+
+def test_answers_faq_and_writes_memory_mapped_index(local_index):
+    answer, score = local_answer.answer_locally("Bagaimana cara mengetahui lowongan kerja terbaru?")
+    assert answer == "Info lowongan kerja terbaru dapat diakses di website dinas"
+    assert score > 0.9
+    assert os.path.exists(f"{local_index}.matrix.npy")
+    assert local_answer.get_index()['matrix'].__class__.__name__ == "memmap"
+
+def test_index_rebuilds_when_knowledge_signature_changes(local_index):
+    local_answer.get_index()
+    with open(f"{local_index}.json", encoding='utf-8') as f:
+        old_signature = json.load(f)['signature']
+
+    data = knowledge.load_knowledge()
+    data['faq'].append({"pertanyaan": "Kapan bursa kerja digelar?", "jawaban": "Bursa kerja digelar bulan Agustus"})
+    data['meta']['version'] = "2.0"
+    knowledge.save_knowledge(data)
+
+    answer, _ = local_answer.answer_locally("kapan bursa kerja digelar")
+    assert answer == "Bursa kerja digelar bulan Agustus"
+    with open(f"{local_index}.json", encoding='utf-8') as f:
+        assert json.load(f)['signature'] != old_signature
+
+def test_stale_index_on_disk_is_rebuilt(local_index, monkeypatch):
+    local_answer.get_index()
+    with open(f"{local_index}.json", encoding='utf-8') as f:
+        meta = json.load(f)
+    meta['signature'] = "usang"
+    meta['passages'] = ["jawaban lama"] * len(meta['passages'])
+    with open(f"{local_index}.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    monkeypatch.setattr(local_answer, "_index", None)
+    assert "jawaban lama" not in local_answer.get_index()['answers']
+
+def test_confident_answer_rejects_off_target_match(local_index):
+    # Cocok dengan nama resmi dinas hanya karena kata "transmigrasi"
+    answer, score = local_answer.confident_answer("apa itu transmigrasi", 0.4, 0.1)
+    assert answer is None
+    assert score > 0.4
+
+def test_confident_answer_accepts_clear_match(local_index):
+    answer, _ = local_answer.confident_answer("cara daftar pelatihan", 0.4, 0.1)
+    assert answer.startswith("*Pelatihan Keterampilan Kerja* - Pendaftaran")
+
+def test_hand_edit_without_meta_change_rebuilds_index(local_index, knowledge_file):
+    answer, _ = local_answer.confident_answer("nomor telepon kantor", 0.4, 0.1)
+    assert answer == "Telepon: 0538-1234567"
+
+    # Edit langsung ke file (worker lain / manual), meta tidak berubah
+    with open(knowledge_file, encoding='utf-8') as f:
+        data = json.load(f)
+    data['info_dinas']['telepon'] = "0538-7654321"
+    with open(knowledge_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.utime(knowledge_file, ns=(10**18, 10**18))
+
+    answer, _ = local_answer.confident_answer("nomor telepon kantor", 0.4, 0.1)
+    assert answer == "Telepon: 0538-7654321"
+
+def test_no_groq_fallback_threshold_still_requires_key_terms(local_index):
+    # Ambang yang dipakai answer_from_knowledge (LOCAL_MIN_SCORE, tanpa margin)
+    answer, score = local_answer.confident_answer("apa itu transmigrasi di disnaker", 0.2, 0.0)
+    assert answer is None
+    assert score >= 0.2
+
+    answer, _ = local_answer.confident_answer("syarat kartu kuning", 0.2, 0.0)
+    assert answer.startswith("*Kartu Pencari Kerja (AK-1)* - Syarat")
@@ -0,0 +1,100 @@
+from collections import deque
+
+import pytest
+
+import profiling
+
+@pytest.fixture(autouse=True)
+def fresh_buffer(monkeypatch):
+    monkeypatch.setattr(profiling, "_traces", deque(maxlen=profiling.PROFILE_BUFFER_SIZE))
+    profiling._active_trace.set(None)
+    yield
+    profiling._active_trace.set(None)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Jam palsu: setiap _push/_pop membaca waktu berikutnya (detik); CPU = separuh wall"""
+    ticks = []
+    monkeypatch.setattr(profiling, "_now", lambda: (ticks[0], ticks.pop(0) / 2))
+    return ticks
+
+@profiling.profiled
+def inner():
+    return "hasil"
+
+@profiling.profiled
+def outer():
+    return inner()
+
+OUTER = f"{__name__}.outer"
+INNER = f"{__name__}.inner"
+
+def test_nested_calls_record_self_time_per_stack(clock):
+    # root mulai 0, outer 1-7, inner 2-5, root selesai 10
+    clock.extend([0, 1, 2, 5, 7, 10])
+    profiling.start_trace("webhook", force=True)
+    assert outer() == "hasil"
+    trace_id = profiling.finish_trace()
+
+    trace = profiling._traces[-1]
+    assert trace['id'] == trace_id
+    assert trace['wall_us'] == {
+        "webhook": 4_000_000,
+        f"webhook;{OUTER}": 3_000_000,
+        f"webhook;{OUTER};{INNER}": 3_000_000,
+    }
+    assert trace['cpu_us'][f"webhook;{OUTER}"] == 1_500_000
+    assert trace['total_wall_ms'] == 10_000
+    assert trace['total_cpu_ms'] == 5_000
+    assert '_frames' not in trace
+
+def test_finish_closes_frames_left_open_by_exception(clock):
+    clock.extend([0, 1, 4, 6])
+    profiling.start_trace("webhook", force=True)
+    profiling._push(profiling._active_trace.get(), "gagal")
+    profiling.finish_trace()
+
+    assert profiling._traces[-1]['wall_us'] == {"webhook;gagal": 3_000_000, "webhook": 3_000_000}
+
+def test_no_trace_without_sampling_or_force(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0)
+    assert profiling.start_trace("webhook") is None
+    assert profiling._active_trace.get() is None
+    assert outer() == "hasil"
+    assert profiling.finish_trace() is None
+    assert profiling.list_traces() == []
+
+    assert profiling.start_trace("webhook", force=True) is not None
+    profiling.finish_trace()
+    assert len(profiling.list_traces()) == 1
+
+def test_ring_buffer_evicts_oldest_trace(monkeypatch):
+    monkeypatch.setattr(profiling, "_traces", deque(maxlen=3))
+    ids = []
+    for _ in range(5):
+        profiling.start_trace("webhook", force=True)
+        ids.append(profiling.finish_trace())
+
+    assert [t['id'] for t in profiling.list_traces()] == list(reversed(ids[2:]))
+
+def test_collapsed_stacks_format_and_trace_filter(clock):
+    clock.extend([0, 1, 2, 5, 7, 10, 20, 21, 22, 23, 24, 30])
+    first = profiling.start_trace("webhook", force=True)
+    outer()
+    profiling.finish_trace()
+    profiling.start_trace("webhook", force=True)
+    outer()
+    profiling.finish_trace()
+
+    # Baris "stack nilai" terurut, dijumlahkan antar trace
+    assert profiling.collapsed_stacks().splitlines() == [
+        "webhook 11000000",
+        f"webhook;{OUTER} 5000000",
+        f"webhook;{OUTER};{INNER} 4000000",
+    ]
+    assert profiling.collapsed_stacks(metric="cpu", trace_id=first).splitlines() == [
+        "webhook 2000000",
+        f"webhook;{OUTER} 1500000",
+        f"webhook;{OUTER};{INNER} 1500000",
+    ]
+    assert profiling.collapsed_stacks(trace_id="tidak-ada") == ""
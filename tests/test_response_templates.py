@@ -0,0 +1,72 @@
+import copy
+import json
+import os
+
+import knowledge
+import response_templates
+
+def _write(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+def test_bad_knowledge_entry_keeps_last_good_templates(knowledge_file, monkeypatch):
+    monkeypatch.setattr(response_templates, "_compiled", None)
+    data = copy.deepcopy(knowledge.DEFAULT_KNOWLEDGE)
+    _write(knowledge_file, data)
+    assert response_templates.matches_template('sapaan', 'halo')
+
+    monkeypatch.setattr(response_templates, "build_template_context",
+                        lambda k: (_ for _ in ()).throw(KeyError("rusak")))
+    data['meta']['version'] = "rusak"
+    _write(knowledge_file, data)
+    os.utime(knowledge_file, ns=(1, 1))
+
+    assert response_templates.matches_template('sapaan', 'halo')
+    assert response_templates.match_common_response('jam buka kantor')
+
+def test_training_without_duration_still_renders(knowledge_file, monkeypatch):
+    monkeypatch.setattr(response_templates, "_compiled", None)
+    data = copy.deepcopy(knowledge.DEFAULT_KNOWLEDGE)
+    data['layanan']['pelatihan_vokasi']['jenis_pelatihan'].append({"nama": "Barista"})
+    _write(knowledge_file, data)
+
+    response = response_templates.match_common_response('info pelatihan')
+    assert "- Barista" in response
+
+def test_templates_reload_when_file_changes_on_disk(knowledge_file, monkeypatch):
+    monkeypatch.setattr(response_templates, "_compiled", None)
+    data = copy.deepcopy(knowledge.DEFAULT_KNOWLEDGE)
+    _write(knowledge_file, data)
+    assert "Tamiang Layang" in response_templates.match_common_response('alamat')
+
+    # Edit dari proses lain: tidak lewat save_knowledge
+    data['info_dinas']['alamat'] = "Jl. Baru No. 1"
+    _write(knowledge_file, data)
+    os.utime(knowledge_file, ns=(10**18, 10**18))
+
+    assert "Jl. Baru No. 1" in response_templates.match_common_response('alamat')
+
+def test_empty_answer_list_falls_back_to_default(knowledge_file, monkeypatch):
+    monkeypatch.setattr(response_templates, "_compiled", None)
+    data = copy.deepcopy(knowledge.DEFAULT_KNOWLEDGE)
+    data['template_respons']['sapaan']['jawaban'] = []
+    _write(knowledge_file, data)
+
+    assert response_templates.matches_template('sapaan', 'halo')
+    assert response_templates.render_template('sapaan')
+
+def test_revision_stat_is_cached_between_checks(knowledge_file, monkeypatch):
+    knowledge.save_knowledge(copy.deepcopy(knowledge.DEFAULT_KNOWLEDGE))
+    monkeypatch.setattr(knowledge, "REVISION_CHECK_INTERVAL", 60)
+    revision = knowledge.get_knowledge_revision()
+
+    calls = []
+    real_stat = os.stat
+    monkeypatch.setattr(knowledge.os, "stat", lambda path: calls.append(path) or real_stat(path))
+    for _ in range(5):
+        assert knowledge.get_knowledge_revision() == revision
+    assert calls == []
+
+    # Simpan di proses ini tetap langsung terlihat
+    knowledge.save_knowledge(knowledge.load_knowledge())
+    assert knowledge.get_knowledge_revision() != revision